@@ -0,0 +1,148 @@
+"""Deterministic synthetic traffic for the benchmarks, written as pcap and MinLog files.
+
+Every packet is exchanged between one of the hosts and one of the partners. 80 % of the packets are downloads to a
+host with 54 to 1500 bytes, the others uploads with 54 to 120 bytes, 70 % are TCP and the others UDP. The inter
+arrival times follow the chosen distribution with the given mean rate. The same arguments always give the same files.
+
+    python benchmarks/generate.py capture --packets 100000 --hosts 1 --partners 10 --iat exponential --rate 1000
+"""
+from pathlib import Path
+from typing import Dict, Union
+import argparse
+import struct
+
+import numpy as np
+
+IAT_DISTRIBUTIONS = ["exponential", "pareto", "lognormal", "constant"]
+START_NS = 1_600_000_000 * 1_000_000_000
+CHUNK_PACKETS = 1 << 17
+PCAP_NS_HEADER = struct.pack("<IHHiIII", 0xa1b23c4d, 2, 4, 0, 0, 65535, 1)
+LOG_HEADER = "Time;SrcIP;SrcPort;DstIP;DstPort;IPv;Type;Size\n"
+# ethernet, ipv4 and the longer transport header (tcp)
+MIN_LENGTH = 14 + 20 + 20
+TCP, UDP = 6, 17
+
+
+def get_iats(rng: np.random.Generator, packets: int, iat: str, rate: float) -> np.ndarray:
+    """returns inter arrival times in seconds with a mean of 1 / rate
+
+    """
+    mean = 1 / rate
+    if iat == "exponential":
+        return rng.exponential(mean, packets)
+    if iat == "pareto":
+        # a shape of 1.5 gives heavy tails with a finite mean of scale * 3
+        return (rng.pareto(1.5, packets) + 1) * mean / 3
+    if iat == "lognormal":
+        return rng.lognormal(np.log(mean) - 0.5, 1.0, packets)
+    if iat == "constant":
+        return np.full(packets, mean)
+    raise ValueError(f"the inter arrival times have to be one of {', '.join(IAT_DISTRIBUTIONS)}")
+
+
+def generate(packets: int, hosts: int = 1, partners: int = 10, iat: str = "exponential", rate: float = 1000.0,
+             seed: int = 0) -> Dict[str, np.ndarray]:
+    """returns the packet columns: times in ns, ipv4 addresses as integers, ports, protocol numbers and lengths
+
+    """
+    rng = np.random.default_rng(seed)
+    times = START_NS + np.cumsum(np.round(get_iats(rng, packets, iat, rate) * 1e9)).astype(np.int64)
+    host = (10 << 24) + 1 + rng.integers(0, hosts, packets)
+    partner = (93 << 24) + (184 << 16) + 1 + rng.integers(0, partners, packets)
+    download = rng.random(packets) < 0.8
+    protocols = np.where(rng.random(packets) < 0.7, TCP, UDP)
+    client_ports = 50000 + rng.integers(0, 16, packets)
+    server_ports = np.where(protocols == TCP, 443, 53)
+    lengths = np.where(download, rng.integers(MIN_LENGTH, 1501, packets), rng.integers(MIN_LENGTH, 121, packets))
+    return {"times": times,
+            "src_ips": np.where(download, partner, host),
+            "dst_ips": np.where(download, host, partner),
+            "src_ports": np.where(download, server_ports, client_ports),
+            "dst_ports": np.where(download, client_ports, server_ports),
+            "protocols": protocols,
+            "lengths": lengths}
+
+
+def put(buffer: np.ndarray, offsets: np.ndarray, values: np.ndarray, dtype: str):
+    """writes one value of the given dtype at every offset of the buffer
+
+    """
+    data = np.ascontiguousarray(values, dtype=dtype).view(np.uint8).reshape(len(offsets), -1)
+    buffer[offsets[:, None] + np.arange(data.shape[1])] = data
+
+
+def write_pcap(file: Union[str, Path], traffic: Dict[str, np.ndarray]):
+    """writes an ethernet pcap with nanosecond timestamps, every frame has the full length with a zero payload
+
+    """
+    with Path(file).open("wb") as pcap:
+        pcap.write(PCAP_NS_HEADER)
+        for start in range(0, len(traffic["times"]), CHUNK_PACKETS):
+            chunk = {name: values[start:start + CHUNK_PACKETS] for name, values in traffic.items()}
+            lengths = chunk["lengths"]
+            records = np.concatenate(([0], np.cumsum(16 + lengths)[:-1]))
+            buffer = np.zeros(int(np.sum(16 + lengths)), dtype=np.uint8)
+
+            put(buffer, records, chunk["times"] // 1_000_000_000, "<u4")
+            put(buffer, records + 4, chunk["times"] % 1_000_000_000, "<u4")
+            put(buffer, records + 8, lengths, "<u4")
+            put(buffer, records + 12, lengths, "<u4")
+            frames = records + 16
+            put(buffer, frames + 12, np.full(len(frames), 0x0800), ">u2")
+            ip = frames + 14
+            buffer[ip] = 0x45
+            put(buffer, ip + 2, lengths - 14, ">u2")
+            buffer[ip + 8] = 64
+            buffer[ip + 9] = chunk["protocols"]
+            put(buffer, ip + 12, chunk["src_ips"], ">u4")
+            put(buffer, ip + 16, chunk["dst_ips"], ">u4")
+            l4 = ip + 20
+            put(buffer, l4, chunk["src_ports"], ">u2")
+            put(buffer, l4 + 2, chunk["dst_ports"], ">u2")
+            tcp = chunk["protocols"] == TCP
+            buffer[l4[tcp] + 12] = 0x50
+            put(buffer, l4[~tcp] + 4, lengths[~tcp] - 34, ">u2")
+            pcap.write(buffer.tobytes())
+
+
+def write_log(file: Union[str, Path], traffic: Dict[str, np.ndarray]):
+    """writes a MinLog file with the same packets as write_pcap
+
+    """
+    with Path(file).open("w") as log:
+        log.write(LOG_HEADER)
+        for start in range(0, len(traffic["times"]), CHUNK_PACKETS):
+            chunk = {name: values[start:start + CHUNK_PACKETS].tolist() for name, values in traffic.items()}
+            log.write("".join(
+                f"{time // 1_000_000_000}.{time % 1_000_000_000:09d};{ip_string(src)};{src_port};{ip_string(dst)};"
+                f"{dst_port};4;{'TCP' if protocol == TCP else 'UDP'};{length}\n"
+                for time, src, src_port, dst, dst_port, protocol, length in zip(
+                    chunk["times"], chunk["src_ips"], chunk["src_ports"], chunk["dst_ips"], chunk["dst_ports"],
+                    chunk["protocols"], chunk["lengths"])))
+
+
+def ip_string(ip: int) -> str:
+    return f"{ip >> 24}.{ip >> 16 & 255}.{ip >> 8 & 255}.{ip & 255}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("prefix", help="the files are written to PREFIX.pcap and PREFIX.log")
+    parser.add_argument("--packets", type=int, default=100000)
+    parser.add_argument("--hosts", type=int, default=1)
+    parser.add_argument("--partners", type=int, default=10)
+    parser.add_argument("--iat", choices=IAT_DISTRIBUTIONS, default="exponential")
+    parser.add_argument("--rate", type=float, default=1000.0, help="mean packets per second")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--formats", nargs="+", choices=["pcap", "log"], default=["pcap", "log"])
+    args = parser.parse_args()
+
+    traffic = generate(args.packets, args.hosts, args.partners, args.iat, args.rate, args.seed)
+    if "pcap" in args.formats:
+        write_pcap(f"{args.prefix}.pcap", traffic)
+    if "log" in args.formats:
+        write_log(f"{args.prefix}.log", traffic)
+
+
+if __name__ == "__main__":
+    main()
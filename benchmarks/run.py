@@ -0,0 +1,182 @@
+"""Times reading, stats, features, every comparison metric and the sieve on generated captures of growing size.
+
+For every size an original and a target capture with the same traffic model and different seeds are generated as
+pcap and MinLog files (see generate.py), and every step is timed --repeat times, the fastest run counts. Only the
+step itself is timed, the captures and comparators it needs are built and the lazily imported dependencies are
+imported before. The dynamic time warping steps reduce the series to --dtw-length points, the full distance of a
+million packets would take hours. The results are written as json, and with --baseline compared to a saved result: a
+step is a regression if it got slower by more than --tolerance and by more than --min-difference seconds. Exits with
+1 if there is a regression.
+
+    python benchmarks/run.py -o results.json [--sizes 10000 100000 1000000 10000000] [--baseline baseline.json]
+    python benchmarks/run.py --compare results.json --baseline baseline.json
+"""
+from pathlib import Path
+import argparse
+import datetime
+import json
+import platform
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np  # noqa: E402
+
+from generate import IAT_DISTRIBUTIONS, generate, write_log, write_pcap  # noqa: E402
+from src.Comparator import Comparator, COMPARISON_MODULES, METRICS  # noqa: E402
+from src.PacketCapture import PacketCapture  # noqa: E402
+from src.ReferenceProfile import ReferenceProfile  # noqa: E402
+from src.Sieve import Sieve  # noqa: E402
+from src.TimeWarping import TimeWarping  # noqa: E402
+from src.datamodel.MinLog import MinLogReader  # noqa: E402
+from src.datamodel.Pcap import Pcap  # noqa: E402
+from src.lazy import preload  # noqa: E402
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+
+
+def get_files(directory: Path, packets: int, args, seed: int):
+    """returns the pcap and the log file of the capture, they are generated if they don't exist yet
+
+    """
+    prefix = directory / f"{packets}-{args.hosts}-{args.partners}-{args.iat}-{args.rate:g}-{seed}"
+    pcap, log = prefix.with_suffix(".pcap"), prefix.with_suffix(".log")
+    if not pcap.exists() or not log.exists():
+        traffic = generate(packets, args.hosts, args.partners, args.iat, args.rate, seed)
+        write_pcap(pcap, traffic)
+        write_log(log, traffic)
+    return pcap, log
+
+
+def timed(step, setup, repeat: int) -> dict:
+    """returns the fastest and all run times of step(setup()) in seconds, or the error of the step
+
+    """
+    runs = []
+    try:
+        for _ in range(repeat):
+            argument = setup()
+            start = time.perf_counter()
+            step(argument)
+            runs.append(time.perf_counter() - start)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    return {"seconds": min(runs), "runs": runs}
+
+
+def get_steps(original: Path, target: Path, original_log: Path, time_warping: TimeWarping) -> dict:
+    """returns per step name the step and its setup
+
+    """
+    original_capture = PacketCapture(original, Pcap(original).read())
+    target_capture = PacketCapture(target, Pcap(target).read())
+    profile = ReferenceProfile(original_capture)
+
+    steps = {"Pcap.read": (lambda file: Pcap(file).read(), lambda: original),
+             "MinLogReader.read": (lambda file: MinLogReader(file).read(), lambda: original_log),
+             "PacketCapture.get_stats": (lambda capture: capture.get_stats(),
+                                         lambda: PacketCapture(original, original_capture.packets)),
+             "PacketCapture.calc_features": (lambda capture: capture.calc_features(),
+                                             lambda: PacketCapture(original, original_capture.packets)),
+             "Comparator": (lambda capture: Comparator(profile, capture, time_warping),
+                            lambda: PacketCapture(target, target_capture.packets))}
+    for metric, feature in METRICS:
+        steps[f"Comparator.calculate_metric {metric} {feature}"] = (
+            lambda comparator, metric=metric, feature=feature: comparator.calculate_metric(metric, feature),
+            lambda: Comparator(profile, target_capture, time_warping))
+    steps["Sieve.sieve"] = (lambda sieve: sieve.sieve(), lambda: Sieve(profile, target_capture, None, time_warping))
+    return steps
+
+
+def run(args) -> dict:
+    time_warping = TimeWarping(args.dtw_window, args.dtw_length)
+    results = []
+    # the comparison dependencies are imported on first use, which would otherwise be timed as part of a metric
+    preload(COMPARISON_MODULES)
+    with tempfile.TemporaryDirectory() as temporary:
+        directory = Path(args.data_dir or temporary)
+        directory.mkdir(parents=True, exist_ok=True)
+        for packets in args.sizes:
+            original, original_log = get_files(directory, packets, args, args.seed)
+            target, _ = get_files(directory, packets, args, args.seed + 1)
+            for name, (step, setup) in get_steps(original, target, original_log, time_warping).items():
+                result = {"step": name, "packets": packets, **timed(step, setup, args.repeat)}
+                print(format_result(result), flush=True)
+                results.append(result)
+
+    return {"meta": {"date": datetime.datetime.now().isoformat(timespec="seconds"),
+                     "python": platform.python_version(),
+                     "numpy": np.__version__,
+                     "platform": platform.platform(),
+                     "processor": platform.processor(),
+                     "arguments": {name: value for name, value in vars(args).items()
+                                   if name not in ["output", "baseline", "compare", "data_dir"]}},
+            "results": results}
+
+
+def format_result(result: dict) -> str:
+    value = f"{result['seconds']:10.4f}s" if "seconds" in result else result["error"]
+    return f"{result['step'][:72]:<72} {result['packets']:>9} {value}"
+
+
+def compare(current: dict, baseline: dict, tolerance: float, min_difference: float) -> bool:
+    """prints the change of every step that is in both results and returns whether one of them is a regression
+
+    """
+    baseline_seconds = {(result["step"], result["packets"]): result.get("seconds")
+                        for result in baseline["results"]}
+    regression = False
+    print(f"{'step':<72} {'packets':>9} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for result in current["results"]:
+        before = baseline_seconds.get((result["step"], result["packets"]))
+        after = result.get("seconds")
+        if before is None or after is None:
+            continue
+        slower = after > before * (1 + tolerance) and after - before > min_difference
+        regression |= slower
+        print(f"{result['step'][:72]:<72} {result['packets']:>9} {before:10.4f} {after:10.4f} "
+              f"{after / before if before else float('inf'):7.2f}{'  REGRESSION' if slower else ''}")
+    return regression
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", help="json file the results are written to")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of packets")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--hosts", type=int, default=1)
+    parser.add_argument("--partners", type=int, default=10)
+    parser.add_argument("--iat", choices=IAT_DISTRIBUTIONS, default="exponential")
+    parser.add_argument("--rate", type=float, default=1000.0, help="mean packets per second")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dtw-window", type=float, default=None)
+    parser.add_argument("--dtw-length", type=int, default=10000)
+    parser.add_argument("--data-dir", help="directory the generated captures are kept in, a temporary one if unset")
+    parser.add_argument("--baseline", help="json results to compare to")
+    parser.add_argument("--compare", help="compare these json results to the baseline instead of running")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    parser.add_argument("--min-difference", type=float, default=0.005, help="allowed slowdown in seconds")
+    args = parser.parse_args()
+
+    if args.compare:
+        if not args.baseline:
+            parser.error("--compare needs a --baseline")
+        with Path(args.compare).open() as f:
+            current = json.load(f)
+    else:
+        current = run(args)
+        if args.output:
+            with Path(args.output).open("w") as f:
+                json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with Path(args.baseline).open() as f:
+            baseline = json.load(f)
+        sys.exit(1 if compare(current, baseline, args.tolerance, args.min_difference) else 0)
+
+
+if __name__ == "__main__":
+    main()
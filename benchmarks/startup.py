@@ -0,0 +1,83 @@
+"""Measures the startup time of the pcapstats commands and checks it against a budget.
+
+Every case runs in a fresh interpreter, the median of --repeat runs is compared to its budget in seconds. The first
+calls run each command once on a small generated capture with one process and without the cache. Also checks that
+the top level help imports none of the heavy dependencies. Exits with 1 if a budget is exceeded.
+
+    python benchmarks/startup.py [--repeat 5] [--scale 1.0]
+"""
+from pathlib import Path
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from generate import generate, write_log
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ["scapy", "scipy", "pandas", "networkx", "dtaidistance", "jinja2"]
+
+
+def get_cases(directory: Path) -> dict:
+    """returns the budget in seconds of every command line
+
+    """
+    original, target = directory / "original.log", directory / "target.log"
+    write_log(original, generate(2000, partners=9, rate=200, seed=0))
+    write_log(target, generate(2000, partners=9, rate=200, seed=1))
+    output = ["-o", str(directory / "out.json"), "-p", "1", "--no-cache"]
+    return {("--help",): 0.6,
+            ("stats", "--help"): 0.6,
+            ("compare", "--help"): 0.6,
+            ("filter", "--help"): 0.6,
+            ("convert", "--help"): 0.6,
+            ("stats", str(original), *output): 1.5,
+            ("compare", str(original), str(target), *output): 4.0,
+            ("filter", str(original), str(target), *output): 4.0,
+            ("convert", str(original), "-o", str(directory), "-p", "1"): 1.5}
+
+
+def measure(args, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "from cli import cli; cli()", *args], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def get_heavy_imports() -> list:
+    """returns the heavy modules importing the command line interface loads
+
+    """
+    code = f"import sys, cli; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True,
+                          text=True).stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="factor all budgets are multiplied by")
+    args = parser.parse_args()
+
+    failed = False
+    heavy = get_heavy_imports()
+    print(f"{'heavy modules imported by cli':<60} {' '.join(heavy) or 'none'}")
+    failed |= bool(heavy)
+    with tempfile.TemporaryDirectory() as directory:
+        for case, budget in get_cases(Path(directory)).items():
+            seconds = measure(case, args.repeat)
+            exceeded = seconds > budget * args.scale
+            failed |= exceeded
+            name = " ".join(Path(arg).name if arg.startswith(directory) else arg for arg in case)
+            print(f"{name[:60]:<60} {seconds:6.3f}s  budget {budget * args.scale:6.3f}s"
+                  f"{'  EXCEEDED' if exceeded else ''}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
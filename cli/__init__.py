@@ -3,6 +3,7 @@ import click
 from cli.compare import cli_compare
 from cli.stats import cli_stats
 from cli.filter import cli_filter
+from cli.convert import cli_convert
 
 
 @click.group()
@@ -14,3 +15,4 @@ def cli(**kwargs):
 cli.add_command(cli_compare)
 cli.add_command(cli_stats)
 cli.add_command(cli_filter)
+cli.add_command(cli_convert)
@@ -1,8 +1,17 @@
+import src.profiling as profiling
 import src.utils as utils
-from src.Comparator import Comparator
+from src.CachedCapture import CachedCapture
+from src.Comparator import Comparator, COMPARISON_MODULES
+from src.FileCache import FileCache
+from src.NdjsonWriter import NdjsonWriter
+from src.ReferenceProfile import ReferenceProfile
+from src.StallSimulator import DEFAULT_STALL_PARAMETERS
+from src.TimeWarping import TimeWarping
+from src.lazy import preload
 from src.visualize import visualize as viz
 
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import repeat
 import tqdm
 from pathlib import Path
 
@@ -10,18 +19,37 @@ import json
 import click
 
 
-def comparison_wrapper(data):
-    return comparison_worker(*data)
+# the reference profile of the original and the cache, handed to every worker process once by init_worker
+_profile = None
+_cache = None
 
 
-def comparison_worker(original, target):
-    stats = target.get_stats()
+def init_worker(profile, cache):
+    global _profile, _cache
+    _profile = profile
+    _cache = cache
 
-    comp = Comparator(original, target)
-    comp.calc_features()
+
+def comparison_worker(target, stall_parameters=DEFAULT_STALL_PARAMETERS, time_warping=None, flows=False):
+    """returns the stats, features, comparisons and graph of the target against the shared original
+
+    The target is read in the worker and only these plain results are sent back, not the captures.
+    """
+    if not utils.is_supported(target):
+        return None
+    target_pcap = CachedCapture(target, _cache)
+
+    comp = Comparator(_profile, target_pcap, time_warping)
+    comp.calc_features(stall_parameters)
     comp.calculate_metrics()
+    if flows:
+        comp.get_flow_size_comparison()
 
-    return target, stats, comp
+    return {"file": target,
+            "stats": target_pcap.get_stats(),
+            "features": comp.get_features()[comp.target_filename],
+            "comparisons": comp.get_comparisons(),
+            "graph": comp.get_graphs()[comp.target_filename]}
 
 
 @click.command("compare", help="Calculate similarity metrics and statistics for one or more pcap file.")
@@ -31,36 +59,89 @@ def comparison_worker(original, target):
 @click.option("-v", "--visualize", is_flag=True)
 @click.option("-vo", "--visualize-output", type=str, default="result.html")
 @click.option("-p", "--processes", type=int, default=4, help="Maximum amount of concurrent processes.")
-def cli_compare(original, targets, output, visualize, visualize_output, processes):
+@click.option("-sp", "--stall-parameters", type=(float, float), multiple=True, metavar="ALPHA BITRATE",
+              help="Buffer threshold in seconds and video bitrate in kbit/s of a stall simulation. Can be given "
+                   "multiple times, defaults to 30 8000.")
+@click.option("-dw", "--dtw-window", type=float, help="Sakoe-Chiba window of the dynamic time warping as a fraction "
+                                                       "of the longer series, default is no window.")
+@click.option("-dl", "--dtw-length", type=int, help="Average the series down to this many points before the dynamic "
+                                                    "time warping, default is no downsampling.")
+@click.option("--flows", is_flag=True, help="Also compare the distributions of the bytes per 5-tuple flow.")
+@click.option("--no-cache", is_flag=True, help="Neither read nor store results in the cache of unchanged files.")
+@click.option("--ndjson", is_flag=True, help="Write one JSON record per line to the output as soon as a target is "
+                                             "done. The first record holds the original.")
+@click.option("--resume", is_flag=True, help="With --ndjson, skip the targets already in the output and append to it.")
+@click.option("--profile", type=click.Path(dir_okay=False), help="Record wall time, CPU time and peak memory of every "
+              "stage and metric per file and process, write them as JSON to this file and print a summary table.")
+@profiling.profile_command("compare")
+def cli_compare(original, targets, output, visualize, visualize_output, processes, stall_parameters, dtw_window,
+                dtw_length, flows, no_cache, ndjson, resume):
+    if visualize and ndjson:
+        raise click.UsageError("The visualization needs the JSON output, it is not available with --ndjson.")
     feature_dict = {}
     comparison_dict = {}
     stats_dict = {}
     graph_dict = {}
 
     click.echo("Comparing pcap files...")
-    original_pcap = utils.read_file(original)
+    if not utils.is_supported(original):
+        click.echo("No valid file type supplied. Aborting…")
+        return
 
+    cache = FileCache(enabled=not no_cache)
+    original_pcap = CachedCapture(original, cache)
     stats_dict[Path(original).name] = original_pcap.get_stats()
 
-    if not original_pcap:
-        click.echo("No valid file type supplied. Aborting…")
+    stall_parameters = list(stall_parameters) or DEFAULT_STALL_PARAMETERS
+    profile = ReferenceProfile(original_pcap)
+    time_warping = TimeWarping(dtw_window, dtw_length)
+    # computed before the profile is handed to the workers, so that they do not each compute it again
+    feature_dict[profile.filename] = profile.get_features(stall_parameters)
+    graph_dict[profile.filename] = profile.graph
+    if flows:
+        profile.get_flow_sizes()
+
+    # forked workers inherit the modules of the parent, so the comparison dependencies are imported once here
+    preload(COMPARISON_MODULES)
+
+    if ndjson:
+        with NdjsonWriter(output, resume=resume) as writer:
+            if writer.empty:
+                writer.write({"original": original, "stats": stats_dict[profile.filename],
+                              "features": feature_dict[profile.filename], "graph": profile.graph})
+            pending = [target for target in targets if target not in writer.done]
+            with ProcessPoolExecutor(max_workers=processes, initializer=init_worker,
+                                     initargs=(profile, cache)) as executor:
+                worker = profiling.wrap(comparison_worker)
+                futures = [executor.submit(worker, target, stall_parameters, time_warping, flows)
+                           for target in pending]
+                for future in tqdm.tqdm(as_completed(futures), total=len(futures)):
+                    result = profiling.unwrap(future.result())
+                    if result is not None:
+                        writer.write(result)
+        cache.evict()
+        click.echo(f"Wrote results of {len(pending)} targets to {output}, skipped {len(targets) - len(pending)}.")
         return
 
-    zipped_targets = [[original_pcap, target_pcap] for target_pcap in [utils.read_file(target) for target in targets]]
-
-    with ProcessPoolExecutor(max_workers=processes) as executor:
-        for _target, _stats, _comp_results in list(tqdm.tqdm(executor.map(comparison_wrapper, zipped_targets),
-                                                             total=len(zipped_targets))):
-            stats_dict[Path(_target.file).name] = _stats
-            feature_dict = {**feature_dict, **_comp_results.get_features()}
-            comparison_dict = {**comparison_dict, **_comp_results.get_comparisons()}
-            graph_dict = {**graph_dict, **_comp_results.get_graphs()}
+    # the profile goes to every worker once instead of once per target, and each worker reads its own targets
+    with ProcessPoolExecutor(max_workers=processes, initializer=init_worker, initargs=(profile, cache)) as executor:
+        for result in tqdm.tqdm(map(profiling.unwrap, executor.map(
+                profiling.wrap(comparison_worker), targets, repeat(stall_parameters), repeat(time_warping),
+                repeat(flows))), total=len(targets)):
+            if result is None:
+                continue
+            target_name = Path(result["file"]).name
+            stats_dict[target_name] = result["stats"]
+            feature_dict[target_name] = result["features"]
+            comparison_dict.update(result["comparisons"])
+            graph_dict[target_name] = result["graph"]
+    cache.evict()
 
     export_dict = {"comparisons": comparison_dict, "features": feature_dict, "graphs": graph_dict, "stats": stats_dict}
 
     if comparison_dict:
         click.echo(f"Writing results to {output}")
-        with open(output, "w") as comp_json:
+        with profiling.stage("write output"), open(output, "w") as comp_json:
             json.dump(export_dict, comp_json)
     else:
         click.echo("No results generated.")
@@ -69,7 +150,8 @@ def cli_compare(original, targets, output, visualize, visualize_output, processe
         if not export_dict["comparisons"]:
             click.echo("Empty List.")
         else:
-            viz(export_dict, visualize_output)
+            with profiling.stage("visualize"):
+                viz(export_dict, visualize_output)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+import src.profiling as profiling
+import src.utils as utils
+from src.datamodel.Columnar import ColumnarWriter, COLUMNAR_SUFFIX
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+import click
+import tqdm
+
+
+def convert_worker(_file, output_dir=None, compression_level=0):
+    output = (Path(output_dir) if output_dir else Path(_file).parent) / (Path(_file).name + COLUMNAR_SUFFIX)
+    if output.exists() and output.samefile(_file):
+        return _file, output
+    try:
+        packets = utils.read_packets(_file)
+    except Exception as e:
+        click.echo(f"Can't read {_file}: {e}. Skipping…")
+        return _file, None
+    if packets is None:
+        click.echo(f"No valid file type supplied: {_file}. Skipping…")
+        return _file, None
+    ColumnarWriter(output, compression_level).write(packets)
+    return _file, output
+
+
+@click.command("convert", help=f"Convert pcap and log files into the columnar {COLUMNAR_SUFFIX} format, which all "
+                               f"commands load much faster.")
+@click.argument("files", nargs=-1)
+@click.option("-o", "--output-dir", type=click.Path(file_okay=False),
+              help="Directory the converted files are written to, default is next to every input file.")
+@click.option("-c", "--compression-level", type=click.IntRange(0, 9), default=0,
+              help="zlib level the columns are compressed with, 0 keeps them uncompressed so that they can be "
+                   "memory mapped.")
+@click.option("-p", "--processes", type=int, default=4, help="Maximum amount of concurrent processes.")
+@click.option("--profile", type=click.Path(dir_okay=False), help="Record wall time, CPU time and peak memory of every "
+              "stage and metric per file and process, write them as JSON to this file and print a summary table.")
+@profiling.profile_command("convert")
+def cli_convert(files, output_dir, compression_level, processes):
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    click.echo("Converting pcap files...")
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        converted = [_output for _file, _output in tqdm.tqdm(
+            map(profiling.unwrap, executor.map(profiling.wrap(convert_worker), files, repeat(output_dir),
+                                               repeat(compression_level))), total=len(files))
+            if _output is not None]
+    click.echo(f"Converted {len(converted)} of {len(files)} files.")
+
+
+if __name__ == "__main__":
+    cli_convert()
@@ -1,27 +1,52 @@
+import src.profiling as profiling
 import src.utils as utils
+from src.CachedCapture import CachedCapture
+from src.CaptureSummary import get_bound_names, needs_download_ratio
+from src.Comparator import COMPARISON_MODULES
+from src.FileCache import FileCache
+from src.ReferenceProfile import ReferenceProfile
 from src.Sieve import Sieve
+from src.TimeWarping import TimeWarping
+from src.lazy import preload
 
 from pathlib import Path
 import click
 import json
 from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import tqdm
 
 
-def filter_target_wrapper(data):
-    return filter_target(*data)
+# the reference profile and summary of the original and the cache, handed to every worker process once by init_worker
+_profile = None
+_original_summary = None
+_cache = None
 
 
-def filter_target(target, original_pcap, json_file):
-    target_pcap = utils.read_file(target)
+def init_worker(profile, original_summary=None, cache=None):
+    global _profile, _original_summary, _cache
+    _profile = profile
+    _original_summary = original_summary
+    _cache = cache
 
-    if not target_pcap:
+
+def filter_target(target, json_file, time_warping=None, prefilter=None):
+    if not utils.is_supported(target):
         click.echo("Can't read file. Skipping…")
         raise Exception
+    target_pcap = CachedCapture(target, _cache)
+
+    prefilter_statistics = {}
+    if _original_summary is not None:
+        summary = target_pcap.get_summary(needs_download_ratio(prefilter))
+        violated_bound = _original_summary.get_violated_bound(summary, prefilter)
+        prefilter_statistics = Sieve.get_prefilter_statistics(get_bound_names(prefilter), violated_bound)
+        if violated_bound is not None:
+            return target, False, prefilter_statistics
 
-    similarity_filter = Sieve(original_pcap, target_pcap, json_file)
+    similarity_filter = Sieve(_profile, target_pcap, json_file, time_warping)
 
-    return target, similarity_filter.sieve()
+    return target, similarity_filter.sieve(), {**prefilter_statistics, **similarity_filter.get_metric_statistics()}
 
 
 @click.command("filter", help="Filter pcap files based on similarity metrics.")
@@ -30,29 +55,57 @@ def filter_target(target, original_pcap, json_file):
 @click.option("-o", "--output", default="filter.json", help="File where filter output gets saved.")
 @click.option("-j", "--json-file", help="JSON containing custom thresholds for the available metrics.")
 @click.option("-p", "--processes", type=int, default=4, help="Maximum amount of concurrent processes.")
-def cli_filter(original, targets, output, json_file, processes):
+@click.option("-dw", "--dtw-window", type=float, help="Sakoe-Chiba window of the dynamic time warping as a fraction "
+                                                       "of the longer series, default is no window.")
+@click.option("-dl", "--dtw-length", type=int, help="Average the series down to this many points before the dynamic "
+                                                    "time warping, default is no downsampling.")
+@click.option("--no-cache", is_flag=True, help="Neither read nor store results in the cache of unchanged files.")
+@click.option("--profile", type=click.Path(dir_okay=False), help="Record wall time, CPU time and peak memory of every "
+              "stage and metric per file and process, write them as JSON to this file and print a summary table.")
+@profiling.profile_command("filter")
+def cli_filter(original, targets, output, json_file, processes, dtw_window, dtw_length, no_cache):
     similar = []
     dissimilar = []
+    metric_statistics = {}
 
     click.echo("Comparing pcap files...")
-    original_pcap = utils.read_file(original)
-
-    if not original_pcap:
+    if not utils.is_supported(original):
         click.echo("No valid file type supplied. Aborting…")
         return
 
-    zipped_targets = [[target, original_pcap, json_file] for target in targets]
-
-    with ProcessPoolExecutor(max_workers=processes) as executor:
-        for _target, _filter_result in list(tqdm.tqdm(executor.map(filter_target_wrapper, zipped_targets),
-                                                      total=len(zipped_targets))):
+    cache = FileCache(enabled=not no_cache)
+    original_pcap = CachedCapture(original, cache)
+
+    time_warping = TimeWarping(dtw_window, dtw_length)
+    # targets outside the bounds of the "Prefilter" thresholds are rejected before any test
+    prefilter = Sieve.load_thresholds_from_file(json_file).get("Prefilter") or {}
+    original_summary = None
+    if any(bound is not None for bound in prefilter.values()):
+        original_summary = original_pcap.get_summary(needs_download_ratio(prefilter))
+    profile = ReferenceProfile(original_pcap)
+
+    # forked workers inherit the modules of the parent, so the comparison dependencies are imported once here
+    preload(COMPARISON_MODULES)
+    # the profile goes to every worker once instead of once per target, and each worker reads its own targets
+    with ProcessPoolExecutor(max_workers=processes, initializer=init_worker,
+                             initargs=(profile, original_summary, cache)) as executor:
+        for _target, _filter_result, _metric_statistics in tqdm.tqdm(map(profiling.unwrap, executor.map(
+                profiling.wrap(filter_target), targets, repeat(json_file), repeat(time_warping), repeat(prefilter))),
+                total=len(targets)):
             if _filter_result:
                 similar.append(_target)
             else:
                 dissimilar.append(_target)
+            for metric, counts in _metric_statistics.items():
+                totals = metric_statistics.setdefault(metric, dict.fromkeys(counts, 0))
+                for key, count in counts.items():
+                    totals[key] += count
+
+    cache.evict()
 
-    with Path(output).open("w") as outfile:
-        out_dict = {"original": original, "similar": similar, "dissimilar": dissimilar}
+    with profiling.stage("write output"), Path(output).open("w") as outfile:
+        out_dict = {"original": original, "similar": similar, "dissimilar": dissimilar,
+                    "metric_statistics": metric_statistics}
         json.dump(out_dict, outfile)
 
 
@@ -1,34 +1,106 @@
 from pathlib import Path
+import src.profiling as profiling
 import src.utils as utils
+from src.CachedCapture import CachedCapture
+from src.FileCache import FileCache
+from src.NdjsonWriter import NdjsonWriter
+from src.StallSimulator import DEFAULT_STALL_PARAMETERS
+from src.StreamingStats import StreamingCaptureStats
 
 import json
 import click
 
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import tqdm
 
 
-def stats_worker(_file):
-    pcap = utils.read_file(_file)
-    pcap.calc_features()
-    return _file, pcap.get_stats(), pcap.get_features()
+def stats_worker(_file, stall_parameters=DEFAULT_STALL_PARAMETERS, cache=None, window=None, top_flows=None):
+    pcap = CachedCapture(_file, cache or FileCache(enabled=False))
+    pcap.calc_features(stall_parameters)
+    extra = {}
+    if window is not None:
+        extra["windows"] = {"size": window[0], "step": window[1], **pcap.get_window_stats(*window)}
+    if top_flows is not None:
+        extra["flows"] = pcap.get_flow_stats(top_flows)
+    return _file, pcap.get_stats(), pcap.get_features(), extra
+
+
+def stream_stats_worker(_file, stall_parameters=None, cache=None, window=None, top_flows=None):
+    cache = cache or FileCache(enabled=False)
+    stats = cache.load(_file, "streamed stats")
+    if stats is None:
+        with profiling.stage("stream stats"):
+            accumulator = StreamingCaptureStats()
+            for packets in utils.iter_packets(_file):
+                accumulator.update(packets)
+            stats = accumulator.get_stats()
+        cache.store(_file, "streamed stats", stats)
+    return _file, stats, None, {}
 
 
 @click.command("stats", help="Calculate statistics for one or more pcap files.")
 @click.argument("files", nargs=-1)
 @click.option("-o", "--output", type=str, default="stats.json")
 @click.option("-p", "--processes", type=int, default=4, help="Maximum amount of concurrent processes.")
-def cli_stats(files, output, processes):
+@click.option("-sp", "--stall-parameters", type=(float, float), multiple=True, metavar="ALPHA BITRATE",
+              help="Buffer threshold in seconds and video bitrate in kbit/s of a stall simulation. Can be given "
+                   "multiple times, defaults to 30 8000.")
+@click.option("-s", "--stream", is_flag=True,
+              help="Stream the packets through bounded memory accumulators instead of loading whole captures. "
+                   "Median and mode are approximated and no features are calculated.")
+@click.option("-w", "--window", type=click.FloatRange(min=0, min_open=True), metavar="SECONDS",
+              help="Also calculate the statistics of time windows of this size.")
+@click.option("-ws", "--window-step", type=click.FloatRange(min=0, min_open=True), metavar="SECONDS",
+              help="Start a window every this many seconds, windows overlap if it is smaller than the window size. "
+                   "Defaults to the window size, i.e. tumbling windows.")
+@click.option("--flows", is_flag=True, help="Also aggregate the packets into 5-tuple flows and report flow statistics.")
+@click.option("--top-flows", type=click.IntRange(min=0), default=10, show_default=True,
+              help="Number of largest flows by bytes listed with --flows.")
+@click.option("--no-cache", is_flag=True, help="Neither read nor store results in the cache of unchanged files.")
+@click.option("--ndjson", is_flag=True, help="Write one JSON record per line to the output as soon as a file is done.")
+@click.option("--resume", is_flag=True, help="With --ndjson, skip the files already in the output and append to it.")
+@click.option("--profile", type=click.Path(dir_okay=False), help="Record wall time, CPU time and peak memory of every "
+              "stage and metric per file and process, write them as JSON to this file and print a summary table.")
+@profiling.profile_command("stats")
+def cli_stats(files, output, processes, stream, stall_parameters, window, window_step, flows, top_flows, no_cache,
+              ndjson, resume):
+    if stream and (window or flows):
+        raise click.UsageError("Window and flow statistics are not available with --stream.")
     stats_dict = {}
+    worker = profiling.wrap(stream_stats_worker if stream else stats_worker)
+    stall_parameters = list(stall_parameters) or DEFAULT_STALL_PARAMETERS
+    cache = FileCache(enabled=not no_cache)
+    window = (window, window_step or window) if window else None
 
     click.echo("Analysing pcap files...")
+    if ndjson:
+        with NdjsonWriter(output, resume=resume) as writer:
+            pending = [_file for _file in files if _file not in writer.done]
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                futures = [executor.submit(worker, _file, stall_parameters, cache, window,
+                                           top_flows if flows else None) for _file in pending]
+                for future in tqdm.tqdm(as_completed(futures), total=len(futures)):
+                    _file, _stats, _features, _extra = profiling.unwrap(future.result())
+                    record = {"file": _file, "stats": _stats}
+                    if _features is not None:
+                        record["features"] = _features
+                    writer.write({**record, **_extra})
+        cache.evict()
+        click.echo(f"Wrote results of {len(pending)} files to {output}, skipped {len(files) - len(pending)}.")
+        return
+
     with ProcessPoolExecutor(max_workers=processes) as executor:
-        for _file, _stats, _features in list(tqdm.tqdm(executor.map(stats_worker, files), total=len(files))):
-            stats_dict[Path(_file).name] = {"stats": _stats, "features": _features}
+        for _file, _stats, _features, _extra in tqdm.tqdm(map(profiling.unwrap, executor.map(
+                worker, files, [stall_parameters] * len(files), [cache] * len(files), [window] * len(files),
+                [top_flows if flows else None] * len(files))), total=len(files)):
+            stats_dict[Path(_file).name] = {"stats": _stats} if _features is None else {"stats": _stats,
+                                                                                        "features": _features}
+            stats_dict[Path(_file).name].update(_extra)
+    cache.evict()
 
     if stats_dict:
         click.echo(f"Writing results to {output}")
-        with Path(output).open("w") as stats_out:
+        with profiling.stage("write output"), Path(output).open("w") as stats_out:
             json.dump(stats_dict, stats_out)
     else:
         click.echo("No results generated.")
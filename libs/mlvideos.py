@@ -4,24 +4,29 @@
 import logging
 from contextlib import contextmanager
 import random
-from typing import List, Sequence, Iterator, MutableSequence
+from typing import List, Sequence, Iterator, MutableSequence, Union
 from decimal import Decimal
-from src.datamodel.Packet import Packet
+from src.datamodel.Packet import Packet, Packets, decimal_to_ns, ns_to_decimal
 import bisect
 import numpy as np
 
 
 class PacketTimeWrapper(MutableSequence[Decimal]):
-    def __init__(self, packets: List[Packet]):
+    def __init__(self, packets: Union[List[Packet], Packets]):
         self.packets = packets
 
     def __len__(self) -> int:
         return len(self.packets)
 
     def __getitem__(self, index):
+        if isinstance(self.packets, Packets):
+            return ns_to_decimal(self.packets.times[index])
         return self.packets[index].time
 
     def __setitem__(self, index, value):
+        if isinstance(self.packets, Packets):
+            # the table may be shared or memory mapped, its times are never shifted in place
+            raise TypeError("The times of a Packets table are read-only, use get_normalized_times.")
         self.packets[index].time = value
 
     def insert(self, *args):  # Needed for MutableSequence
@@ -74,16 +79,26 @@ def restore_times(packetlist: Sequence[Packet], basetime: Decimal):
     """Restore previously normalized timestamps."""
     logging.info("Restoring timestamps...")
     if basetime:
-        for i in packetlist:
-            i.time += basetime
+        times = PacketTimeWrapper(packetlist)
+        for i in range(len(times)):
+            times[i] += basetime
+
+
+def get_normalized_times(times: np.ndarray) -> np.ndarray:
+    """Return int64 ns times relative to the first one as a new array, the given times are not changed."""
+    return times - times[0] if len(times) else times.copy()
 
 
 def get_deltas(packets: Sequence[Packet]) -> List[Decimal]:
+    if isinstance(packets, Packets):
+        return [ns_to_decimal(delta) for delta in get_deltas_from_times(packets.times).tolist()]
     return get_deltas_from_times(PacketTimeWrapper(packets))
 
 
 def get_deltas_from_times(times: Sequence[Decimal]) -> List[Decimal]:
     # First packet has no delta
+    if isinstance(times, np.ndarray):
+        return np.concatenate((np.zeros(1, dtype=times.dtype), np.diff(times)))
     return [ Decimal(0) ] + [ times[i + 1] - times[i] for i in range(len(times) - 1) ]
 
 
@@ -103,12 +118,16 @@ def seek(packets: Sequence[Packet], time: Decimal, bisect_right: bool = False) -
 
 
 def sliding_time_window(packetlist: Sequence[Packet], winsize_seconds: Decimal):
-    winsize_seconds = abs(winsize_seconds)
-    times = np.array([ i.time for i in packetlist ])
-
-    for i, packet_time in enumerate(times):
-        winstart = bisect.bisect_left(times, packet_time - winsize_seconds)
-        winstop = bisect.bisect_right(times, packet_time + winsize_seconds)
-        window = packetlist[winstart:winstop]
-        print(i, "/", len(packetlist), " winsize: ", len(window))
-        yield window
+    """Yield for every packet the packets at most winsize_seconds before or after it."""
+    winsize = decimal_to_ns(abs(winsize_seconds))
+    if isinstance(packetlist, Packets):
+        times = packetlist.times
+        packetlist = packetlist.get_packets()
+    else:
+        times = np.array([ decimal_to_ns(i.time) for i in packetlist ], dtype=np.int64)
+
+    # the bounds of all windows at once, the packet times are sorted
+    winstarts = np.searchsorted(times, times - winsize, side="left")
+    winstops = np.searchsorted(times, times + winsize, side="right")
+    for winstart, winstop in zip(winstarts.tolist(), winstops.tolist()):
+        yield packetlist[winstart:winstop]
@@ -0,0 +1,111 @@
+import src.utils as utils
+from src.CaptureSummary import CaptureSummary
+from src.FileCache import FileCache
+from src.PacketCapture import PacketCapture
+from src.StallSimulator import DEFAULT_STALL_PARAMETERS
+from src.lazy import lazy_import
+
+from dataclasses import asdict
+from pathlib import Path
+from typing import List, Union
+
+import numpy as np
+
+json_graph = lazy_import("networkx.readwrite.json_graph")
+
+
+class CachedCapture:
+    """A capture file whose stats, features, series and ip graph are taken from a FileCache where possible.
+
+    It answers the parts of the PacketCapture interface the commands use, and only reads the file if one of the
+    results is missing from the cache. Everything that is computed is stored for the next run.
+    """
+
+    def __init__(self, file: Union[str, Path], cache: FileCache):
+        self.file = Path(file)
+        self.cache = cache
+        self.capture = None
+        self.features = {}
+        self.series = None
+        self.graph_representation = None
+
+    def get_capture(self) -> PacketCapture:
+        if self.capture is None:
+            self.capture = utils.read_file(self.file)
+        return self.capture
+
+    def get_cached(self, name: str, compute):
+        value = self.cache.load(self.file, name)
+        if value is None:
+            value = compute()
+            self.cache.store(self.file, name, value)
+        return value
+
+    def get_stats(self) -> dict:
+        return self.get_cached("stats", lambda: self.get_capture().get_stats())
+
+    def calc_features(self, stall_parameters=DEFAULT_STALL_PARAMETERS):
+        def compute():
+            self.get_capture().calc_features(stall_parameters)
+            return self.get_capture().get_features()
+
+        name = "features " + ",".join(f"{alpha:g}:{bitrate:g}" for alpha, bitrate in stall_parameters)
+        self.features = self.get_cached(name, compute)
+
+    def get_features(self) -> dict:
+        return self.features
+
+    def get_window_stats(self, size: float, step: Union[None, float] = None) -> dict:
+        return self.get_cached(f"windows {float(size)}:{float(step or size)}",
+                               lambda: self.get_capture().get_window_stats(size, step))
+
+    def get_flow_stats(self, top: int = 10) -> dict:
+        return self.get_cached(f"flows {top}", lambda: self.get_capture().get_flow_stats(top))
+
+    def get_flow_sizes(self) -> np.ndarray:
+        arrays = self.cache.load_arrays(self.file, "flow sizes")
+        if arrays is None:
+            arrays = {"bytes": self.get_capture().get_flow_sizes()}
+            self.cache.store_arrays(self.file, "flow sizes", arrays)
+        return arrays["bytes"]
+
+    def get_summary(self, download_ratio: bool = True) -> CaptureSummary:
+        """returns the prefilter summary, the cached one is only used if it has the download ratio when needed
+
+        """
+        summary = self.cache.load(self.file, "summary")
+        if summary is None or (download_ratio and summary["download_ratio"] is None):
+            summary = asdict(CaptureSummary.from_packets(self.get_capture().packets, download_ratio))
+            self.cache.store(self.file, "summary", summary)
+        return CaptureSummary(**summary)
+
+    def get_series(self) -> dict:
+        if self.series is None:
+            self.series = self.cache.load_arrays(self.file, "series")
+        if self.series is None:
+            capture = self.get_capture()
+            self.series = {"deltas": np.asarray(capture.get_deltas(), dtype=np.float64),
+                           "lengths": np.asarray(capture.get_lengths()),
+                           "packets_count_by_second": np.asarray(
+                               list(capture.get_packets_count_by_second().values()), dtype=np.int64)}
+            self.cache.store_arrays(self.file, "series", self.series)
+        return self.series
+
+    def get_deltas(self) -> List[float]:
+        return self.get_series()["deltas"].tolist()
+
+    def get_lengths(self) -> np.ndarray:
+        return self.get_series()["lengths"]
+
+    def get_packets_count_by_second(self) -> dict:
+        """returns dictionary: Keys = seconds and values= packets count
+
+        """
+        return dict(enumerate(self.get_series()["packets_count_by_second"].tolist()))
+
+    def get_ip_graph(self, directed=True):
+        if not self.graph_representation:
+            data = self.get_cached("graph", lambda: json_graph.node_link_data(self.get_capture().get_ip_graph(
+                directed)))
+            self.graph_representation = json_graph.node_link_graph(data)
+        return self.graph_representation
@@ -0,0 +1,71 @@
+from src.CommunicationIndex import CommunicationIndex
+from src.datamodel.Packet import Packets, NS_PER_SECOND
+
+from dataclasses import dataclass
+from typing import List, Union
+
+import numpy as np
+
+# bounds relative to the value of the original
+RELATIVE_BOUNDS = ["Packet_count", "Duration", "Total_length"]
+# bounds on the absolute difference
+ABSOLUTE_BOUNDS = ["Download_ratio"]
+
+
+@dataclass
+class CaptureSummary:
+    """Capture level numbers that are cheap to get from the packet table, used to reject targets before any test."""
+    packet_count: int
+    duration: float
+    total_length: int
+    download_ratio: Union[None, float] = None
+
+    @classmethod
+    def from_packets(cls, packets: Packets, download_ratio: bool = True) -> "CaptureSummary":
+        """summarizes a packet table, the download ratio needs the host detection and is only computed on request
+
+        """
+        times = packets.times
+        # last minus first packet like PacketCapture.get_duration, also for out of order timestamps
+        duration = (int(times[-1]) - int(times[0])) / NS_PER_SECOND if len(times) else 0.0
+        total_length = int(packets.lengths.sum(dtype=np.int64))
+        ratio = None
+        if download_ratio:
+            index = CommunicationIndex(packets)
+            download_length = int(index.pair_bytes[index.is_host[index.pair_dst]].sum())
+            ratio = download_length / total_length if total_length else 0.0
+        return cls(len(packets), duration, total_length, ratio)
+
+    def get_values(self) -> dict:
+        return {"Packet_count": self.packet_count,
+                "Duration": self.duration,
+                "Total_length": self.total_length,
+                "Download_ratio": self.download_ratio}
+
+    def get_violated_bound(self, target: "CaptureSummary", bounds: dict) -> Union[None, str]:
+        """returns the name of the first bound the target exceeds compared to this summary, None if it exceeds none
+
+        Bounds that are missing or null are not checked.
+        """
+        original_values = self.get_values()
+        target_values = target.get_values()
+        for name in get_bound_names(bounds):
+            bound = bounds[name]
+            original, value = original_values[name], target_values[name]
+            difference = abs(value - original)
+            if name in RELATIVE_BOUNDS:
+                difference = difference / original if original else (float("inf") if difference else 0.0)
+            if difference > bound:
+                return name
+        return None
+
+
+def get_bound_names(bounds: dict) -> List[str]:
+    """returns the names of the configured bounds in the order they are checked
+
+    """
+    return [name for name in RELATIVE_BOUNDS + ABSOLUTE_BOUNDS if bounds.get(name) is not None]
+
+
+def needs_download_ratio(bounds: dict) -> bool:
+    return bounds.get("Download_ratio") is not None
@@ -0,0 +1,93 @@
+from src.datamodel.Packet import Packets
+
+from typing import Dict, List
+
+import numpy as np
+
+
+class CommunicationIndex:
+    """Packet and byte counts per (src, dst) pair and the host/partner classification of a capture.
+
+    Everything is computed once from the interned ip columns. Hosts are the addresses that take part in every packet.
+    With at most two addresses the host is the one that receives more packets, and if no address takes part in every
+    packet the most frequent destination is the host. All other addresses are partners.
+    """
+
+    def __init__(self, packets: Packets):
+        self.ip_table = packets.ip_table
+        size = max(len(self.ip_table), 1)
+        self.packets_count = len(packets)
+
+        pairs, inverse, self.pair_packets = np.unique(packets.src_ips.astype(np.int64) * size + packets.dst_ips,
+                                                      return_inverse=True, return_counts=True)
+        self.pair_bytes = np.bincount(inverse.reshape(-1), weights=packets.lengths, minlength=len(pairs)).astype(
+            np.int64)
+        self.pair_src, self.pair_dst = np.divmod(pairs, size)
+
+        self.received = np.bincount(self.pair_dst, weights=self.pair_packets, minlength=size).astype(np.int64)
+        # a packet from an address to itself involves it only once
+        self.involved = self.count_involving(np.ones(len(pairs), dtype=bool))
+        self.ip_ids = np.flatnonzero(self.involved)
+        # sorted by address like the former set of all addresses
+        self.ip_ids = self.ip_ids[np.argsort(np.asarray(self.ip_table, dtype=object)[self.ip_ids], kind="stable")]
+
+        self.is_host = np.zeros(size, dtype=bool)
+        self.is_host[self.find_hosts()] = True
+
+    def count_involving(self, mask: np.ndarray) -> np.ndarray:
+        """returns for every address the number of packets of the masked pairs it takes part in
+
+        """
+        size = len(self.received)
+        src, dst, packets = self.pair_src[mask], self.pair_dst[mask], self.pair_packets[mask]
+        loops = src == dst
+        return (np.bincount(src, weights=packets, minlength=size) +
+                np.bincount(dst[~loops], weights=packets[~loops], minlength=size)).astype(np.int64)
+
+    def find_hosts(self) -> np.ndarray:
+        if not len(self.ip_ids):
+            return self.ip_ids
+        if len(self.ip_ids) <= 2:
+            # the later address wins a tie, like the former get_host_ip
+            received = self.received[self.ip_ids]
+            return self.ip_ids[[len(received) - 1 - int(np.argmax(received[::-1]))]]
+        hosts = self.ip_ids[self.involved[self.ip_ids] == self.packets_count]
+        if not len(hosts):
+            hosts = self.ip_ids[[int(np.argmax(self.received[self.ip_ids]))]]
+        return hosts
+
+    def get_ips(self) -> List[str]:
+        return [self.ip_table[ip_id] for ip_id in self.ip_ids.tolist()]
+
+    def get_host_ids(self) -> np.ndarray:
+        return self.ip_ids[self.is_host[self.ip_ids]]
+
+    def get_partner_ids(self) -> np.ndarray:
+        return self.ip_ids[~self.is_host[self.ip_ids]]
+
+    def get_hosts(self) -> List[str]:
+        return [self.ip_table[ip_id] for ip_id in self.get_host_ids().tolist()]
+
+    def get_partners(self) -> List[str]:
+        return [self.ip_table[ip_id] for ip_id in self.get_partner_ids().tolist()]
+
+    def get_communication_number_with_host(self) -> int:
+        """returns the number of packets involving a host, counted once for every host
+
+        """
+        return int(self.involved[self.get_host_ids()].sum())
+
+    def get_communication_weights(self) -> Dict[str, int]:
+        """returns for every partner the number of packets it exchanged with a host
+
+        """
+        with_host = self.count_involving(self.is_host[self.pair_src] | self.is_host[self.pair_dst])
+        return {self.ip_table[ip_id]: int(with_host[ip_id]) for ip_id in self.get_partner_ids().tolist()}
+
+    def get_pair_counts(self) -> Dict[tuple, tuple]:
+        """returns the number of packets and bytes of every (src, dst) pair
+
+        """
+        return {(self.ip_table[src], self.ip_table[dst]): (packets, _bytes)
+                for src, dst, packets, _bytes in zip(self.pair_src.tolist(), self.pair_dst.tolist(),
+                                                     self.pair_packets.tolist(), self.pair_bytes.tolist())}
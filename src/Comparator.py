@@ -1,36 +1,69 @@
 from src.PacketCapture import PacketCapture
+from src.ReferenceProfile import ReferenceProfile, FLOW_SIZE, get_series, normalize
+from src.StallSimulator import DEFAULT_STALL_PARAMETERS
+from src.TimeWarping import TimeWarping
+from src.lazy import lazy_import
+from src.profiling import profiled, stage
 
 from pathlib import Path
+from typing import List, Tuple, Union
 import math
 
-from dtaidistance import dtw
-from scipy import stats
-import pandas as pd
-from networkx.readwrite import json_graph
 import numpy as np
 
+stats = lazy_import("scipy.stats")
+json_graph = lazy_import("networkx.readwrite.json_graph")
+# everything a comparison imports on first use
+COMPARISON_MODULES = ["scipy.stats", "networkx.readwrite.json_graph", "pandas", "dtaidistance.dtw"]
+
 np.seterr(divide='ignore', invalid='ignore')
 
 
+METRICS = {
+    ("Chi_squared_test", "Delta"): "get_chi_squared_test_deltas",
+    ("Chi_squared_test", "Length"): "get_chi_squared_test_lengths",
+    ("Chi_squared_test", "Packet number by second"): "get_chi_squared_test_packets_number",
+    ("Kolmogorov_smirnov_test", "Delta"): "get_kolmogorov_smirnov_test_deltas",
+    ("Kolmogorov_smirnov_test", "Length"): "get_kolmogorov_smirnov_test_lengths",
+    ("Kolmogorov_smirnov_test", "Packet number by second"): "get_kolmogorov_smirnov_test_packet_number",
+    ("Earth_mover_distance", "Delta"): "get_earth_mover_distance_deltas",
+    ("Earth_mover_distance", "Length"): "get_earth_mover_distance_lengths",
+    ("Earth_mover_distance", "Packet number by second"): "get_earth_mover_distance_packets_number",
+    ("Dynamic_time_warping", "Delta"): "get_dynamic_time_warping_deltas",
+    ("Dynamic_time_warping", "Length"): "get_dynamic_time_warping_lengths",
+    ("Dynamic_time_warping", "Packet number by second"): "get_dynamic_time_warping_packets_number",
+}
+
+
 class Comparator:
-    def __init__(self, original: PacketCapture, target: PacketCapture):
-        self.original = original
+    @profiled("comparator")
+    def __init__(self, original: Union[PacketCapture, ReferenceProfile], target: PacketCapture,
+                 time_warping: TimeWarping = None):
+        self.profile = original if isinstance(original, ReferenceProfile) else ReferenceProfile(original)
+        self.original = self.profile.capture
         self.target = target
+        self.time_warping = time_warping if time_warping is not None else TimeWarping()
 
-        self.original_filename = Path(original.file).name
+        self.original_filename = self.profile.filename
         self.target_filename = Path(target.file).name
 
+        self.target_packets_count_by_second = self.target.get_packets_count_by_second()
+        self.target_series = get_series(self.target, self.target_packets_count_by_second)
+        self.target_normalized = {}
+        self.binned = {}
+
         self.viz = {
             "Frequencies": {},
             "CDF": {}
         }
 
         self.graphs = {
-            self.original_filename: json_graph.node_link_data(self.original.get_ip_graph()),
+            self.original_filename: self.profile.graph,
             self.target_filename: json_graph.node_link_data(self.target.get_ip_graph())
         }
 
         self.features = {}
+        self.flow_comparisons = None
 
         self.comparisons = {
             "Chi_squared_test": {},
@@ -40,18 +73,10 @@ class Comparator:
         }
 
     @staticmethod
-    def get_data_same_length(data_list_ori, data_list_aug):
-        n = len(data_list_ori)
-        if n < 30:
-            out, bins = pd.qcut(data_list_ori, n,
-                                labels=False, retbins=True, duplicates='drop')
-        else:
-            out, bins = pd.qcut(data_list_ori, math.ceil(math.log2(n)) + 1,
-                                labels=False, retbins=True, duplicates='drop')
-        histogram_original, bin_edges = np.histogram(data_list_ori, bins, range=None, normed=None,
-                                                     weights=None, density=None)
-        histogram_augmented, bin_edges = np.histogram(data_list_aug, bins, range=None, normed=None,
-                                                      weights=None, density=None)
+    def scale_histograms(histogram_original, histogram_augmented):
+        """scales the target histogram to the number of values of the original
+
+        """
         length_org = np.cumsum(histogram_original)[-1]
         length_aug = np.cumsum(histogram_augmented)[-1]
         if length_aug != 0:
@@ -59,21 +84,28 @@ class Comparator:
             histogram_augmented = [value * factor for value in histogram_augmented]
         histogram_original = [value * 1.0 for value in histogram_original]
         length_aug = np.cumsum(histogram_augmented)[-1]
-        return bins, histogram_original, histogram_augmented, length_org, length_aug
+        return histogram_original, histogram_augmented, length_org, length_aug
 
-    def get_data_chi_squared(self, data_list_ori, data_list_aug):
-        bins, histogram_original, histogram_augmented, length_org, length_aug = \
-            self.get_data_same_length(data_list_ori, data_list_aug)
+    def get_binned(self, name):
+        """returns the bins of the original, both histograms and their lengths for one series, computed once
+
+        """
+        if name not in self.binned:
+            bins = self.profile.bins[name]
+            histogram_augmented, bin_edges = np.histogram(self.target_series[name], bins)
+            self.binned[name] = (bins, *self.scale_histograms(self.profile.histograms[name], histogram_augmented))
+        return self.binned[name]
+
+    def get_data_chi_squared(self, name):
+        bins, histogram_original, histogram_augmented, length_org, length_aug = self.get_binned(name)
         return bins, histogram_original, histogram_augmented
 
-    def get_cdf_data(self, data_list_ori, data_list_aug):
-        bins, histogram_original, histogram_augmented, length_org, length_aug = \
-            self.get_data_same_length(data_list_ori, data_list_aug)
+    def get_cdf_data(self, name):
+        bins, histogram_original, histogram_augmented, length_org, length_aug = self.get_binned(name)
         return bins, np.cumsum(histogram_original), np.cumsum(histogram_augmented), length_org, length_aug
 
     def get_chi_squared_test_deltas(self):
-        bins, histogram_original, histogram_augmented = self.get_data_chi_squared(self.original.get_deltas(),
-                                                                                  self.target.get_deltas())
+        bins, histogram_original, histogram_augmented = self.get_data_chi_squared("Delta")
         self.comparisons["Chi_squared_test"]["Delta"] = stats.chisquare(histogram_original, histogram_augmented).pvalue
 
         self.viz["Frequencies"]["Delta"] = \
@@ -86,8 +118,7 @@ class Comparator:
             }
 
     def get_chi_squared_test_lengths(self):
-        bins_length, hist_original_length, hist_augmented_length = \
-            self.get_data_chi_squared(self.original.get_lengths(), self.target.get_lengths())
+        bins_length, hist_original_length, hist_augmented_length = self.get_data_chi_squared("Length")
 
         self.comparisons["Chi_squared_test"]["Length"] = \
             stats.chisquare(hist_augmented_length, hist_original_length).pvalue
@@ -103,28 +134,25 @@ class Comparator:
 
     def get_chi_squared_test_packets_number(self):
         bins_packets_seconds, hist_packets_second, hist_augmented_packets_seconds = \
-            self.get_data_chi_squared(list(self.original.get_packets_count_by_second().values()),
-                                      list(self.target.get_packets_count_by_second().values()))
+            self.get_data_chi_squared("Packet number by second")
 
         self.comparisons["Chi_squared_test"]['Packet number by second'] = \
             stats.chisquare(hist_augmented_packets_seconds, hist_packets_second).pvalue
 
         self.viz["Frequencies"]["Packet number by second"] = \
             {
-                "x": list(self.original.get_packets_count_by_second().keys()),
-                "y1": [float(x) for x in list(self.original.get_packets_count_by_second().values())],
-                "y2": [float(x) for x in list(self.target.get_packets_count_by_second().values())],
+                "x": list(self.profile.packets_count_by_second.keys()),
+                "y1": [float(x) for x in list(self.profile.packets_count_by_second.values())],
+                "y2": [float(x) for x in list(self.target_packets_count_by_second.values())],
                 "xaxis": "Time [s]",
                 "yaxis": "Number of Packets %"
             }
 
     def get_kolmogorov_smirnov_test_deltas(self):
-        self.comparisons["Kolmogorov_smirnov_test"]["Delta"] = stats.ks_2samp(self.target.get_deltas(),
-                                                                              self.original.get_deltas()).pvalue
+        self.comparisons["Kolmogorov_smirnov_test"]["Delta"] = stats.ks_2samp(self.target_series["Delta"],
+                                                                              self.profile.series["Delta"]).pvalue
 
-        bins, cumulative_original, cumulative_augmented, histmax, hist2max = self.get_cdf_data(
-            self.original.get_deltas(),
-            self.target.get_deltas())
+        bins, cumulative_original, cumulative_augmented, histmax, hist2max = self.get_cdf_data("Delta")
 
         self.viz["CDF"]["Delta"] = \
             {
@@ -136,11 +164,10 @@ class Comparator:
             }
 
     def get_kolmogorov_smirnov_test_lengths(self):
-        self.comparisons["Kolmogorov_smirnov_test"]["Length"] = stats.ks_2samp(self.target.get_lengths(),
-                                                                               self.original.get_lengths()).pvalue
+        self.comparisons["Kolmogorov_smirnov_test"]["Length"] = stats.ks_2samp(self.target_series["Length"],
+                                                                               self.profile.series["Length"]).pvalue
 
-        bins_lengths, hist_lengths, hist2_lengths, histmax, hist2max = self.get_cdf_data(self.original.get_lengths(),
-                                                                                         self.target.get_lengths())
+        bins_lengths, hist_lengths, hist2_lengths, histmax, hist2max = self.get_cdf_data("Length")
         self.viz["CDF"]["Length"] = \
             {
                 "x": list(bins_lengths[:-1]),
@@ -151,18 +178,17 @@ class Comparator:
             }
 
     def get_kolmogorov_smirnov_test_packet_number(self):
+        values_org = self.profile.series["Packet number by second"]
+        values_aug = self.target_series["Packet number by second"]
         self.comparisons["Kolmogorov_smirnov_test"]['Packet number by second'] = \
-            stats.ks_2samp(list(self.target.get_packets_count_by_second().values()),
-                           list(self.original.get_packets_count_by_second().values())).pvalue
-        values_org = np.array(list(self.original.get_packets_count_by_second().values()))
-        values_aug = np.array(list(self.target.get_packets_count_by_second().values()))
+            stats.ks_2samp(values_aug, values_org).pvalue
 
         npcumsum_org = np.cumsum(values_org)
         npcumsum_aug = np.cumsum(values_aug)
 
         self.viz["CDF"]["Packet number by second"] = \
             {
-                "x": list(self.original.get_packets_count_by_second().keys()),
+                "x": list(self.profile.packets_count_by_second.keys()),
                 "y1": [float(x / npcumsum_org[-1] if int(npcumsum_org[-1]) != 0 else 0) for x in
                        npcumsum_org],
                 "y2": [float(x / npcumsum_aug[-1] if int(npcumsum_aug[-1]) != 0 else 0) for x in
@@ -171,103 +197,125 @@ class Comparator:
                 "yaxis": "Number of Packets %"
             }
 
+    def get_target_normalized(self, name) -> np.ndarray:
+        if name not in self.target_normalized:
+            self.target_normalized[name] = normalize(self.target_series[name])
+        return self.target_normalized[name]
+
+    def get_earth_mover_distance(self, name):
+        """returns the 1st Wasserstein distance of the normalized series, reusing the sorted original
+
+        """
+        return self.earth_mover_distance(self.profile.sorted_normalized[name],
+                                         np.sort(self.get_target_normalized(name)))
+
     @staticmethod
-    def get_data_normalized(original_data, augmented_data):
-        max_org = max(original_data)
-        min_org = min(original_data)
-        max_aug = max(augmented_data)
-        min_aug = min(augmented_data)
-        augmented_data_len = len(augmented_data)
-        original_data_len = len(original_data)
-
-        for i in range(original_data_len):
-            if max_org - min_org != 0:
-                original_data[i] = (original_data[i] - min_org) / (max_org - min_org)
-            else:
-                original_data[i] = 1 / original_data_len
-        for i in range(augmented_data_len):
-            if max_aug - min_aug != 0:
-                augmented_data[i] = (augmented_data[i] - min_aug) / (max_aug - min_aug)
-            else:
-                augmented_data[i] = 1 / augmented_data_len
-        return original_data, augmented_data
+    def earth_mover_distance(original: np.ndarray, target: np.ndarray) -> float:
+        """returns the 1st Wasserstein distance of two sorted series
+
+        """
+        all_values = np.sort(np.concatenate((original, target)), kind="mergesort")
+        deltas = np.diff(all_values)
+        original_cdf = np.searchsorted(original, all_values[:-1], "right") / len(original)
+        target_cdf = np.searchsorted(target, all_values[:-1], "right") / len(target)
+        return float(np.sum(np.multiply(np.abs(original_cdf - target_cdf), deltas)))
 
     def get_earth_mover_distance_deltas(self):
-        original_deltas = self.original.get_deltas().copy()
-        augmented_deltas = self.target.get_deltas().copy()
-        original_deltas, augmented_deltas = self.get_data_normalized(original_deltas, augmented_deltas)
-        self.comparisons["Earth_mover_distance"]["Delta"] = stats.wasserstein_distance(original_deltas,
-                                                                                       augmented_deltas)
+        self.comparisons["Earth_mover_distance"]["Delta"] = self.get_earth_mover_distance("Delta")
 
     def get_earth_mover_distance_lengths(self):
-        original_lengths = self.original.get_lengths().copy()
-        augmented_lengths = self.target.get_lengths().copy()
-        original_lengths, augmented_lengths = self.get_data_normalized(original_lengths, augmented_lengths)
-        self.comparisons["Earth_mover_distance"]["Length"] = stats.wasserstein_distance(original_lengths,
-                                                                                        augmented_lengths)
+        self.comparisons["Earth_mover_distance"]["Length"] = self.get_earth_mover_distance("Length")
 
     def get_earth_mover_distance_packets_number(self):
-        original_packets_number = list(self.original.get_packets_count_by_second().values()).copy()
-        augmented_packets_number = list(self.target.get_packets_count_by_second().values()).copy()
-        original_packets_number, augmented_packets_number = self.get_data_normalized(original_packets_number,
-                                                                                     augmented_packets_number)
         self.comparisons["Earth_mover_distance"]['Packet number by second'] = \
-            stats.wasserstein_distance(original_packets_number, augmented_packets_number)
-
-    def get_dynamic_time_warping_deltas(self):
-        original_deltas = self.original.get_deltas().copy()
-        augmented_deltas = self.target.get_deltas().copy()
-        original_deltas, augmented_deltas = self.get_data_normalized(original_deltas, augmented_deltas)
-        self.comparisons["Dynamic_time_warping"]["Delta"] = dtw.distance(original_deltas, augmented_deltas)
-
-    def get_dynamic_time_warping_lengths(self):
-        original_lengths = self.original.get_lengths().copy()
-        augmented_lengths = self.target.get_lengths().copy()
-        original_lengths, augmented_lengths = self.get_data_normalized(original_lengths, augmented_lengths)
-        self.comparisons["Dynamic_time_warping"]["Length"] = dtw.distance(original_lengths, augmented_lengths)
-
-    def get_dynamic_time_warping_packets_number(self):
-        original_packets_number = list(self.original.get_packets_count_by_second().values()).copy()
-        augmented_packets_number = list(self.target.get_packets_count_by_second().values()).copy()
-        original_packets_number, augmented_packets_number = self.get_data_normalized(original_packets_number,
-                                                                                     augmented_packets_number)
-        self.comparisons["Dynamic_time_warping"]['Packet number by second'] = \
-            dtw.distance(original_packets_number, augmented_packets_number)
+            self.get_earth_mover_distance("Packet number by second")
 
-    def calculate_metrics(self):
-        self.get_chi_squared_test_deltas()
-        self.get_chi_squared_test_lengths()
-        self.get_chi_squared_test_packets_number()
+    def get_dynamic_time_warping(self, name, max_dist=None):
+        """returns the dtw distance of the normalized series, or inf as soon as it is known to exceed max_dist
 
-        self.get_kolmogorov_smirnov_test_deltas()
-        self.get_kolmogorov_smirnov_test_lengths()
-        self.get_kolmogorov_smirnov_test_packet_number()
+        """
+        return self.time_warping.distance(self.profile.normalized[name], self.get_target_normalized(name), max_dist)
 
-        self.get_earth_mover_distance_deltas()
-        self.get_earth_mover_distance_lengths()
-        self.get_earth_mover_distance_packets_number()
+    def get_dynamic_time_warping_deltas(self, max_dist=None):
+        self.comparisons["Dynamic_time_warping"]["Delta"] = self.get_dynamic_time_warping("Delta", max_dist)
 
-        self.get_dynamic_time_warping_deltas()
-        self.get_dynamic_time_warping_lengths()
-        self.get_dynamic_time_warping_packets_number()
+    def get_dynamic_time_warping_lengths(self, max_dist=None):
+        self.comparisons["Dynamic_time_warping"]["Length"] = self.get_dynamic_time_warping("Length", max_dist)
+
+    def get_dynamic_time_warping_packets_number(self, max_dist=None):
+        self.comparisons["Dynamic_time_warping"]['Packet number by second'] = \
+            self.get_dynamic_time_warping("Packet number by second", max_dist)
+
+    @profiled("flow size comparison")
+    def get_flow_size_comparison(self):
+        """compares the distributions of the bytes per flow with the Kolmogorov-Smirnov test and the EMD
+
+        """
+        original = self.profile.get_flow_sizes()
+        self.target_series[FLOW_SIZE] = np.asarray(self.target.get_flow_sizes())
+        self.flow_comparisons = {
+            "Kolmogorov_smirnov_test": float(stats.ks_2samp(self.target_series[FLOW_SIZE], original).pvalue),
+            "Earth_mover_distance": self.earth_mover_distance(self.profile.sorted_normalized_flow_sizes,
+                                                              np.sort(self.get_target_normalized(FLOW_SIZE)))
+        }
+        return self.flow_comparisons
+
+    def calculate_metrics(self, dtw_max_dist=None):
+        """calculates all metrics, dtw distances above dtw_max_dist are reported as inf
+
+        """
+        for metric, feature in METRICS:
+            self.calculate_metric(metric, feature, dtw_max_dist)
+
+    def estimate_cost(self, metric, feature) -> float:
+        """returns a rough estimate of the work a metric needs, in visited values
+
+        """
+        n = len(self.profile.series[feature])
+        m = len(self.target_series[feature])
+        if metric == "Chi_squared_test":
+            return float(n + m)
+        if metric in ["Kolmogorov_smirnov_test", "Earth_mover_distance"]:
+            # both sort the values, the distance also normalizes them first
+            return (n + m) * math.log2(n + m + 1) * (2 if metric == "Earth_mover_distance" else 1)
+        return self.time_warping.estimate_cost(n, m)
+
+    def get_metrics_by_cost(self) -> List[Tuple[str, str]]:
+        """returns all (metric, feature) pairs, cheapest first
+
+        """
+        return sorted(METRICS, key=lambda metric: self.estimate_cost(*metric))
+
+    def calculate_metric(self, metric, feature, dtw_max_dist=None) -> float:
+        """calculates a single metric and returns its value
+
+        """
+        method = getattr(self, METRICS[(metric, feature)])
+        with stage(f"{metric} {feature}"):
+            if metric == "Dynamic_time_warping":
+                method(dtw_max_dist)
+            else:
+                method()
+        return self.comparisons[metric][feature]
 
     def get_features(self):
         return self.features
 
-    def calc_features(self):
-        self.original.calc_features()
-        self.target.calc_features()
+    def calc_features(self, stall_parameters=DEFAULT_STALL_PARAMETERS):
+        self.target.calc_features(stall_parameters)
 
         self.features = {
-            self.original_filename: self.original.get_features(),
+            self.original_filename: self.profile.get_features(stall_parameters),
             self.target_filename: self.target.get_features()
         }
 
     def get_comparisons(self, raw=False):
         if raw:
             return self.comparisons
-        return {f"{self.original_filename},{self.target_filename}": {"metrics": self.comparisons,
-                                                                     "visualization_data": self.viz}}
+        comparison = {"metrics": self.comparisons, "visualization_data": self.viz}
+        if self.flow_comparisons is not None:
+            comparison["flow_sizes"] = self.flow_comparisons
+        return {f"{self.original_filename},{self.target_filename}": comparison}
 
     def get_graphs(self):
         return self.graphs
@@ -0,0 +1,39 @@
+from src.datamodel.Packet import Packets
+
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class DirectedTraffic:
+    """The packets of one direction (download or upload) with their times, their read-only times relative to the
+    first of them and cumulative byte counts."""
+    mask: np.ndarray
+    times: np.ndarray
+    relative_times: np.ndarray
+    lengths: np.ndarray
+    cumulative_lengths: np.ndarray
+
+    @classmethod
+    def from_mask(cls, packets: Packets, mask: np.ndarray) -> "DirectedTraffic":
+        lengths = packets.lengths[mask].astype(np.int64)
+        times = packets.times[mask]
+        relative_times = times - times[0] if len(times) else times.copy()
+        relative_times.setflags(write=False)
+        return cls(mask, times, relative_times, lengths, np.cumsum(lengths))
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def get_total_length(self) -> int:
+        """returns the total length in byte
+
+        """
+        return int(self.cumulative_lengths[-1]) if len(self) else 0
+
+    def get_relative_times(self) -> np.ndarray:
+        """returns the times in ns relative to the first packet of this direction
+
+        """
+        return self.relative_times
@@ -0,0 +1,174 @@
+from pathlib import Path
+from typing import Dict, Union
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from src.profiling import profiled
+
+DEFAULT_MAX_SIZE = 1 << 30
+# the code the cached results are computed by, a change of any of these files invalidates the cache
+SOURCE_PACKAGES = ["src", "libs"]
+
+
+def get_default_directory() -> Path:
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "pcapstats"
+
+
+def get_code_version() -> str:
+    """returns a hash of the sources of the packages the results are computed by
+
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    root = Path(__file__).resolve().parent.parent
+    for package in SOURCE_PACKAGES:
+        for source in sorted((root / package).rglob("*.py")):
+            digest.update(source.relative_to(root).as_posix().encode())
+            digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+
+class FileCache:
+    """Persistent cache of results derived from capture files, keyed by the content of the file.
+
+    Entries are stored under the blake2b hash of the file content and the code version, so renamed or copied files
+    hit the same entries and results of older code are never returned. The content hash of a path is remembered
+    together with its size and mtime, and only computed again when one of them changes. Reading an entry marks it as
+    used, and evict() removes the least recently used entries and path records until the cache fits into max_size
+    bytes.
+    A disabled cache never returns or stores anything.
+    """
+
+    def __init__(self, directory: Union[None, str, Path] = None, max_size: int = DEFAULT_MAX_SIZE,
+                 enabled: bool = True):
+        self.directory = Path(directory) if directory is not None else get_default_directory()
+        self.max_size = max_size
+        self.enabled = enabled
+        self.code_version = get_code_version() if enabled else None
+        self.digests = {}
+
+    def get_digest(self, file: Union[str, Path]) -> str:
+        """returns the content hash of the file, from the remembered hash if size and mtime did not change
+
+        """
+        file = Path(file).resolve()
+        if file in self.digests:
+            return self.digests[file]
+        stat = file.stat()
+        record = self.directory / "paths" / f"{hash_bytes(str(file).encode())}.json"
+        try:
+            known = json.loads(record.read_text())
+            if known["size"] == stat.st_size and known["mtime"] == stat.st_mtime_ns:
+                self.digests[file] = known["digest"]
+                self.touch(record)
+                return known["digest"]
+        except (OSError, ValueError, KeyError):
+            pass
+        digest = hashlib.blake2b(digest_size=16)
+        with file.open("rb") as handle:
+            for block in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(block)
+        self.digests[file] = digest.hexdigest()
+        self.write(record, json.dumps({"size": stat.st_size, "mtime": stat.st_mtime_ns,
+                                       "digest": self.digests[file]}).encode())
+        return self.digests[file]
+
+    def get_entry_path(self, file: Union[str, Path], name: str, suffix: str) -> Path:
+        return self.directory / "entries" / self.code_version / self.get_digest(file) / f"{name}{suffix}"
+
+    @profiled("cache read")
+    def load(self, file: Union[str, Path], name: str):
+        """returns the json value stored as name for the file, or None
+
+        """
+        if not self.enabled:
+            return None
+        path = self.get_entry_path(file, name, ".json")
+        try:
+            value = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+        self.touch(path)
+        return value
+
+    @profiled("cache write")
+    def store(self, file: Union[str, Path], name: str, value) -> None:
+        if self.enabled:
+            self.write(self.get_entry_path(file, name, ".json"), json.dumps(value).encode())
+
+    @profiled("cache read")
+    def load_arrays(self, file: Union[str, Path], name: str) -> Union[None, Dict[str, np.ndarray]]:
+        """returns the arrays stored as name for the file, or None
+
+        """
+        if not self.enabled:
+            return None
+        path = self.get_entry_path(file, name, ".npz")
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {key: data[key] for key in data.files}
+        except (OSError, ValueError):
+            return None
+        self.touch(path)
+        return arrays
+
+    @profiled("cache write")
+    def store_arrays(self, file: Union[str, Path], name: str, arrays: Dict[str, np.ndarray]) -> None:
+        if not self.enabled:
+            return
+        path = self.get_entry_path(file, name, ".npz")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".npz", delete=False) as handle:
+            np.savez(handle, **arrays)
+        os.replace(handle.name, path)
+
+    def evict(self) -> None:
+        """removes the least recently used entries and path records until the cache is not larger than max_size
+
+        """
+        entries = self.directory / "entries"
+        if not self.enabled or not self.directory.is_dir():
+            return
+        files = []
+        for path in [*entries.rglob("*"), *(self.directory / "paths").glob("*")]:
+            if path.is_file():
+                stat = path.stat()
+                files.append((stat.st_mtime_ns, stat.st_size, path))
+        size = sum(file_size for _, file_size, _ in files)
+        for _, file_size, path in sorted(files, key=lambda file: file[0]):
+            if size <= self.max_size:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            size -= file_size
+        for directory in sorted((path for path in entries.rglob("*") if path.is_dir()), reverse=True):
+            try:
+                directory.rmdir()
+            except OSError:
+                pass
+
+    @staticmethod
+    def touch(path: Path) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def write(path: Path, data: bytes) -> None:
+        """writes data to a temporary file first, so that concurrent readers never see a partial entry
+
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as handle:
+            handle.write(data)
+        os.replace(handle.name, path)
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
@@ -0,0 +1,121 @@
+from src.datamodel.Packet import Packets, NS_PER_SECOND, factorize_rows
+from src.describe import describe
+
+from typing import List
+
+import numpy as np
+
+FLOW_ORDERS = ["bytes", "packets", "duration"]
+
+
+class FlowTable:
+    """Packets, bytes, duration, inter-arrival time and length moments and the direction split of every flow.
+
+    A flow is the set of packets with the same layer type and the same two (ip, port) endpoints, in either
+    direction. The packets are grouped in one pass by hashing their canonical 5-tuples, and all statistics are then
+    computed per group with bincount. The forward direction of a flow is the one of its first packet.
+    """
+
+    def __init__(self, packets: Packets):
+        self.ip_table = packets.ip_table
+        self.type_table = packets.type_table
+
+        src_ips, dst_ips = packets.src_ips.astype(np.int64), packets.dst_ips.astype(np.int64)
+        src_ports, dst_ports = packets.src_ports.astype(np.int64), packets.dst_ports.astype(np.int64)
+        swapped = (src_ips > dst_ips) | ((src_ips == dst_ips) & (src_ports > dst_ports))
+        keys = np.empty(len(packets), dtype=[("ip1", "<i4"), ("port1", "<u2"), ("ip2", "<i4"), ("port2", "<u2"),
+                                             ("type", "<u2")])
+        keys["ip1"] = np.where(swapped, dst_ips, src_ips)
+        keys["port1"] = np.where(swapped, dst_ports, src_ports)
+        keys["ip2"] = np.where(swapped, src_ips, dst_ips)
+        keys["port2"] = np.where(swapped, src_ports, dst_ports)
+        keys["type"] = packets.types
+        if len(packets):
+            _, flows = factorize_rows(keys.view(np.uint8).reshape(len(packets), -1))
+        else:
+            flows = np.zeros(0, dtype=np.int64)
+
+        # the packets of every flow in the order they arrived
+        order = np.lexsort((packets.times, flows))
+        flows, times, lengths = flows[order], packets.times[order], packets.lengths[order].astype(np.float64)
+        swapped = swapped[order]
+        starts = np.flatnonzero(np.concatenate(([True], flows[1:] != flows[:-1]))) if len(flows) else flows
+        count = len(starts)
+
+        self.packets = np.diff(np.append(starts, len(flows)))
+        self.bytes = np.bincount(flows, weights=lengths, minlength=count).astype(np.int64)
+        self.start_times = times[starts]
+        self.durations = (times[np.append(starts[1:], len(flows)) - 1] - self.start_times) / NS_PER_SECOND \
+            if count else np.zeros(0)
+        self.length_means, self.length_stds = grouped_moments(flows, lengths, self.packets)
+
+        same_flow = flows[1:] == flows[:-1]
+        iat_flows = flows[1:][same_flow]
+        self.iat_means, self.iat_stds = grouped_moments(iat_flows, (np.diff(times)[same_flow]) / NS_PER_SECOND,
+                                                        self.packets - 1)
+
+        first = order[starts]
+        forward = swapped == swapped[starts][flows]
+        self.forward_packets = np.bincount(flows[forward], minlength=count)
+        self.forward_bytes = np.bincount(flows[forward], weights=lengths[forward], minlength=count).astype(np.int64)
+        self.src_ips, self.dst_ips = packets.src_ips[first], packets.dst_ips[first]
+        self.src_ports, self.dst_ports = packets.src_ports[first], packets.dst_ports[first]
+        self.types = packets.types[first]
+
+    def __len__(self) -> int:
+        return len(self.packets)
+
+    def get_order_values(self, by: str) -> np.ndarray:
+        if by not in FLOW_ORDERS:
+            raise ValueError(f"flows can only be ordered by {', '.join(FLOW_ORDERS)}")
+        return {"bytes": self.bytes, "packets": self.packets, "duration": self.durations}[by]
+
+    def get_top(self, k: int, by: str = "bytes") -> List[dict]:
+        """returns the k largest flows by bytes, packets or duration, largest first
+
+        """
+        values = self.get_order_values(by)
+        k = min(k, len(self))
+        if k <= 0:
+            return []
+        top = np.argpartition(-values, k - 1)[:k]
+        top = top[np.lexsort((top, -values[top]))]
+        return [self.get_flow(flow) for flow in top.tolist()]
+
+    def get_flow(self, flow: int) -> dict:
+        return {"Source": f"{self.ip_table[self.src_ips[flow]]}:{self.src_ports[flow]}",
+                "Destination": f"{self.ip_table[self.dst_ips[flow]]}:{self.dst_ports[flow]}",
+                "Type": self.type_table[self.types[flow]],
+                "Packets": int(self.packets[flow]),
+                "Bytes": int(self.bytes[flow]),
+                "Duration": float(self.durations[flow]),
+                "Forward packets": int(self.forward_packets[flow]),
+                "Forward bytes": int(self.forward_bytes[flow]),
+                "Backward packets": int(self.packets[flow] - self.forward_packets[flow]),
+                "Backward bytes": int(self.bytes[flow] - self.forward_bytes[flow]),
+                "Length mean": float(self.length_means[flow]),
+                "Length std": float(self.length_stds[flow]),
+                "IAT mean": float(self.iat_means[flow]),
+                "IAT std": float(self.iat_stds[flow])}
+
+    def get_stats(self, top: int = 10) -> dict:
+        """returns the number of flows, the statistics of their sizes and durations and the top flows by bytes
+
+        """
+        return {"Number of flows": len(self),
+                "Packets": describe(self.packets),
+                "Bytes": describe(self.bytes),
+                "Duration": describe(self.durations),
+                "Top flows": self.get_top(top)}
+
+
+def grouped_moments(groups: np.ndarray, values: np.ndarray, counts: np.ndarray):
+    """returns per group the mean and the sample standard deviation of the values, from two bincount passes
+
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.bincount(groups, weights=values, minlength=len(counts)) / counts
+        deviations = values - means[groups]
+        squares = np.bincount(groups, weights=deviations * deviations, minlength=len(counts))
+        stds = np.where(counts > 1, np.sqrt(squares / (counts - 1)), np.nan)
+    return means, stds
@@ -0,0 +1,69 @@
+from src.profiling import profiled
+
+from pathlib import Path
+from typing import Union
+import json
+import time
+
+
+class NdjsonWriter:
+    """Writes results as newline delimited json, one record per line, as soon as they are available.
+
+    The file is flushed at least every flush_interval seconds, so a crashed run keeps everything written before.
+    With resume an existing file is continued: a partially written last line is cut off, and the values of key of
+    the records already written are collected in done, so that their targets can be skipped.
+    """
+
+    def __init__(self, file: Union[str, Path], key: str = "file", resume: bool = False, flush_interval: float = 1.0):
+        self.file = Path(file)
+        self.key = key
+        self.flush_interval = flush_interval
+        self.done = set()
+        self.empty = True
+
+        if resume and self.file.exists():
+            self.handle = self.file.open("r+b")
+            valid_end = self.read_records()
+            self.handle.seek(valid_end)
+            self.handle.truncate()
+        else:
+            self.handle = self.file.open("wb")
+        self.last_flush = time.monotonic()
+
+    def read_records(self) -> int:
+        """collects the keys of the complete records and returns the offset after the last of them
+
+        """
+        valid_end = 0
+        for line in self.handle:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b"\n"):
+                break
+            valid_end += len(line)
+            self.empty = False
+            if self.key in record:
+                self.done.add(record[self.key])
+        return valid_end
+
+    @profiled("write output")
+    def write(self, record: dict):
+        self.handle.write(json.dumps(record).encode() + b"\n")
+        self.empty = False
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.handle.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.handle.close()
+
+    def __enter__(self) -> "NdjsonWriter":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
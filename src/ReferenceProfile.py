@@ -0,0 +1,93 @@
+from src.PacketCapture import PacketCapture
+from src.StallSimulator import DEFAULT_STALL_PARAMETERS
+from src.lazy import lazy_import
+from src.profiling import profiled
+
+from pathlib import Path
+import math
+
+import numpy as np
+
+pd = lazy_import("pandas")
+json_graph = lazy_import("networkx.readwrite.json_graph")
+
+SERIES = ["Delta", "Length", "Packet number by second"]
+FLOW_SIZE = "Flow size"
+
+
+class ReferenceProfile:
+    """Everything the Comparator derives from the original capture, computed once.
+
+    The profile is only read by the comparisons, so one instance can be shared by all targets.
+    """
+
+    @profiled("reference profile")
+    def __init__(self, capture: PacketCapture):
+        self.capture = capture
+        self.file = capture.file
+        self.filename = Path(capture.file).name
+
+        self.packets_count_by_second = capture.get_packets_count_by_second()
+        self.series = get_series(capture, self.packets_count_by_second)
+        self.bins = {name: self.get_bins(data) for name, data in self.series.items()}
+        self.histograms = {name: np.histogram(self.series[name], self.bins[name])[0] for name in SERIES}
+        self.normalized = {name: normalize(data) for name, data in self.series.items()}
+        self.sorted_normalized = {name: np.sort(data) for name, data in self.normalized.items()}
+
+        self.graph = json_graph.node_link_data(capture.get_ip_graph())
+        self.features = {}
+        # only needed for flow comparisons, kept apart from the series every comparison works on
+        self.flow_sizes = None
+        self.sorted_normalized_flow_sizes = None
+
+    @staticmethod
+    def get_bins(data) -> np.ndarray:
+        """returns the quantile bin edges all series are binned into
+
+        """
+        n = len(data)
+        if n < 30:
+            out, bins = pd.qcut(data, n, labels=False, retbins=True, duplicates='drop')
+        else:
+            out, bins = pd.qcut(data, math.ceil(math.log2(n)) + 1, labels=False, retbins=True, duplicates='drop')
+        return bins
+
+    def get_flow_sizes(self) -> np.ndarray:
+        """returns the bytes of every flow of the original, computed on first use
+
+        """
+        if self.flow_sizes is None:
+            flow_sizes = np.asarray(self.capture.get_flow_sizes())
+            self.sorted_normalized_flow_sizes = np.sort(normalize(flow_sizes))
+            self.flow_sizes = flow_sizes
+        return self.flow_sizes
+
+    def get_features(self, stall_parameters=DEFAULT_STALL_PARAMETERS) -> dict:
+        key = tuple(map(tuple, stall_parameters))
+        if key not in self.features:
+            self.capture.calc_features(stall_parameters)
+            self.features[key] = self.capture.get_features()
+        return self.features[key]
+
+
+def get_series(capture: PacketCapture, packets_count_by_second: dict = None) -> dict:
+    """returns the deltas, lengths and packet numbers by second the comparisons work on
+
+    """
+    if packets_count_by_second is None:
+        packets_count_by_second = capture.get_packets_count_by_second()
+    return {"Delta": np.asarray(capture.get_deltas(), dtype=np.float64),
+            "Length": np.asarray(capture.get_lengths()),
+            "Packet number by second": np.asarray(list(packets_count_by_second.values()))}
+
+
+def normalize(data) -> np.ndarray:
+    """returns a min-max normalized float copy of data
+
+    """
+    data = np.asarray(data, dtype=np.float64)
+    min_data = data.min()
+    max_data = data.max()
+    if max_data - min_data != 0:
+        return (data - min_data) / (max_data - min_data)
+    return np.full(len(data), 1 / len(data))
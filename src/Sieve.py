@@ -1,8 +1,12 @@
 from src.PacketCapture import PacketCapture
-from src.Comparator import Comparator
+from src.Comparator import Comparator, METRICS
+from src.ReferenceProfile import ReferenceProfile
+from src.TimeWarping import TimeWarping
 from src.UnanimityVoter import UnanimityVoter
+from src.profiling import profiled
 
 from pathlib import Path
+from typing import List, Union
 import json
 
 try:
@@ -12,12 +16,18 @@ except ImportError:
 
 
 class Sieve:
-    def __init__(self, original: PacketCapture, target: PacketCapture, thresholds_file: str):
+    def __init__(self, original: Union[PacketCapture, ReferenceProfile], target: PacketCapture, thresholds_file: str,
+                 time_warping: TimeWarping = None):
         self.original = original
         self.target = target
+        self.time_warping = time_warping
 
         self.weights = self.load_thresholds_from_file(thresholds_file)
 
+        self.evaluated = []
+        self.skipped = []
+        self.rejected_by = None
+
     @staticmethod
     def load_thresholds_from_file(file: str) -> dict:
         if file:
@@ -29,12 +39,49 @@ class Sieve:
         return thresholds
 
     def calculate_metrics(self):
-        comp = Comparator(self.original, self.target)
-        comp.calculate_metrics()
+        comp = Comparator(self.original, self.target, self.time_warping)
+        # a dtw distance only has to be computed as far as needed to tell that it exceeds the threshold
+        comp.calculate_metrics(dtw_max_dist=self.weights["Dynamic_time_warping"])
 
         return comp.get_comparisons(raw=True)
 
+    @profiled("sieve")
     def sieve(self) -> bool:
-        metrics = self.calculate_metrics()
-        voter = UnanimityVoter(metrics, self.weights)
-        return voter.vote()
+        """evaluates the metrics cheapest first and stops at the first one that violates its threshold
+
+        """
+        comp = Comparator(self.original, self.target, self.time_warping)
+        voter = UnanimityVoter({}, self.weights)
+        metrics = comp.get_metrics_by_cost()
+        for idx, (metric, feature) in enumerate(metrics):
+            value = comp.calculate_metric(metric, feature, dtw_max_dist=self.weights["Dynamic_time_warping"])
+            self.evaluated.append((metric, feature))
+            if not voter.passes(metric, value):
+                self.rejected_by = (metric, feature)
+                self.skipped = metrics[idx + 1:]
+                return False
+        return True
+
+    @staticmethod
+    def get_prefilter_statistics(bounds: List[str], violated_bound: Union[None, str]) -> dict:
+        """returns the statistics of the prefilter bounds, checked in the given order up to the violated one
+
+        If a bound was violated all metrics count as skipped.
+        """
+        checked = bounds[:bounds.index(violated_bound) + 1] if violated_bound is not None else bounds
+        statistics = {f"Prefilter,{bound}": {"evaluated": int(bound in checked),
+                                             "skipped": int(bound not in checked),
+                                             "rejected": int(bound == violated_bound)} for bound in bounds}
+        if violated_bound is not None:
+            statistics.update({f"{metric},{feature}": {"evaluated": 0, "skipped": 1, "rejected": 0}
+                               for metric, feature in METRICS})
+        return statistics
+
+    def get_metric_statistics(self) -> dict:
+        """returns for every metric whether it was evaluated, skipped or rejected the target
+
+        """
+        return {f"{metric},{feature}": {"evaluated": int((metric, feature) in self.evaluated),
+                                        "skipped": int((metric, feature) in self.skipped),
+                                        "rejected": int((metric, feature) == self.rejected_by)}
+                for metric, feature in METRICS}
@@ -0,0 +1,49 @@
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_STALL_PARAMETERS = [(30, 8000)]
+
+
+class StallSimulator:
+    """Simulates video playback on a per-second download series for many (alpha, bitrate) pairs at once.
+
+    Playback starts once the buffer holds alpha seconds of video at the given bitrate and stalls when the buffer runs
+    empty in a second without download. The seconds are walked once and all parameter pairs are advanced together.
+    """
+
+    def __init__(self, download_rates: Sequence[float]):
+        self.download_rates = [float(rate) for rate in download_rates]
+
+    def simulate(self, parameters: Sequence[Tuple[float, float]] = DEFAULT_STALL_PARAMETERS) -> Dict[str, np.ndarray]:
+        """returns the initial delay, the total stall time and the stall count for every (alpha, bitrate) pair
+
+        """
+        alpha, bitrate = np.asarray(parameters, dtype=np.float64).reshape(-1, 2).T
+        buffer = np.zeros(len(alpha))
+        play = np.zeros(len(alpha), dtype=bool)
+        second_counter = np.zeros(len(alpha))
+        playback_starts = np.zeros(len(alpha), dtype=np.int64)
+        initial_delay = np.zeros(len(alpha))
+        stall_time = np.zeros(len(alpha))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for download_rate in self.download_rates:
+                second_counter += 1  # 1 loop == 1 second
+                buffer += download_rate / bitrate
+                start = ~play & (buffer >= alpha)
+                stall = ~start & play & (buffer == 0)
+                playing = play & ~stall
+
+                delta = second_counter + alpha * bitrate / download_rate
+                initial_delay[start & (playback_starts == 0)] = delta[start & (playback_starts == 0)]
+                stall_time[start & (playback_starts > 0)] += delta[start & (playback_starts > 0)]
+                playback_starts += start
+
+                buffer = np.where(start | playing, np.maximum(buffer - 1, 0), buffer)
+                play = (play | start) & ~stall
+                second_counter[start | stall] = 0
+
+        return {"initial_delay": initial_delay,
+                "stall_time": stall_time,
+                "stall_count": np.maximum(playback_starts - 1, 0)}
@@ -0,0 +1,257 @@
+from src.datamodel.Packet import Packets, NS_PER_SECOND
+from src.describe import STATISTICS, moment_statistics
+
+import copy
+from typing import Iterable, Union
+
+import numpy as np
+
+SKETCH_SIZE = 2048
+
+
+class Moments:
+    """Running count, mean, 2nd to 4th central moment sums and exact min/max, mergeable with Chan/Pébay's formulas."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def update(self, values: np.ndarray):
+        if not len(values):
+            return
+        batch = Moments()
+        batch.n = len(values)
+        batch.mean = values.sum() / batch.n
+        deviations = values - batch.mean
+        squared = deviations * deviations
+        batch.m2 = squared.sum()
+        batch.m3 = (squared * deviations).sum()
+        batch.m4 = (squared * squared).sum()
+        batch.min = values.min()
+        batch.max = values.max()
+        self.merge(batch)
+
+    def merge(self, other: "Moments"):
+        if not other.n:
+            return
+        if not self.n:
+            self.__dict__.update(other.__dict__)
+            return
+        na, nb = self.n, other.n
+        n = na + nb
+        delta = other.mean - self.mean
+
+        m4 = self.m4 + other.m4 + delta ** 4 * na * nb * (na * na - na * nb + nb * nb) / n ** 3 + \
+            6 * delta ** 2 * (na * na * other.m2 + nb * nb * self.m2) / n ** 2 + \
+            4 * delta * (na * other.m3 - nb * self.m3) / n
+        m3 = self.m3 + other.m3 + delta ** 3 * na * nb * (na - nb) / n ** 2 + \
+            3 * delta * (na * other.m2 - nb * self.m2) / n
+        m2 = self.m2 + other.m2 + delta ** 2 * na * nb / n
+
+        self.n, self.mean, self.m2, self.m3, self.m4 = n, self.mean + delta * nb / n, m2, m3, m4
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+
+    def shift(self, offset: float):
+        """adds offset to every value seen so far, the central moments stay the same
+
+        """
+        self.mean += offset
+        self.min += offset
+        self.max += offset
+
+
+class QuantileSketch:
+    """Bounded summary of a distribution for approximate median and mode.
+
+    Values are kept as weighted centroids with the range of values they cover. As long as there are at most
+    SKETCH_SIZE distinct values the sketch is exact, beyond that neighbouring centroids are merged into groups of equal
+    weight. Sketches merge by pooling their centroids.
+    """
+
+    def __init__(self, size: int = SKETCH_SIZE):
+        self.size = size
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+        self.lows = np.zeros(0)
+        self.highs = np.zeros(0)
+
+    def update(self, values: np.ndarray):
+        if not len(values):
+            return
+        unique, counts = np.unique(values, return_counts=True)
+        self.add(unique, counts.astype(np.float64), unique, unique)
+
+    def merge(self, other: "QuantileSketch"):
+        self.add(other.means, other.weights, other.lows, other.highs)
+
+    def shift(self, offset: float):
+        self.means = self.means + offset
+        self.lows = self.lows + offset
+        self.highs = self.highs + offset
+
+    def add(self, means: np.ndarray, weights: np.ndarray, lows: np.ndarray, highs: np.ndarray):
+        means = np.concatenate((self.means, means))
+        order = np.argsort(means, kind="stable")
+        self.means = means[order]
+        self.weights = np.concatenate((self.weights, weights))[order]
+        self.lows = np.concatenate((self.lows, lows))[order]
+        self.highs = np.concatenate((self.highs, highs))[order]
+
+        exact = self.lows == self.highs
+        if len(self.means) > 1 and (exact[1:] & exact[:-1] & (self.means[1:] == self.means[:-1])).any():
+            self.compress(np.concatenate(([True], self.means[1:] != self.means[:-1])))
+        if len(self.means) > self.size:
+            # compress to half the size, so that the next updates do not have to compress right away
+            groups = self.size // 2
+            before = np.cumsum(self.weights) - self.weights
+            group = np.floor(before / self.weights.sum() * groups).astype(np.int64)
+            starts = np.concatenate(([True], group[1:] != group[:-1]))
+            # centroids as heavy as a whole group stay on their own, they are the mode candidates
+            heavy = self.weights >= self.weights.sum() / groups
+            starts |= heavy
+            starts[1:] |= heavy[:-1]
+            self.compress(starts)
+
+    def compress(self, group_starts: np.ndarray):
+        """merges every run of centroids into one, group_starts marks the first centroid of every run
+
+        """
+        starts = np.flatnonzero(group_starts)
+        weights = np.add.reduceat(self.weights, starts)
+        self.means = np.add.reduceat(self.means * self.weights, starts) / weights
+        self.weights = weights
+        self.lows = np.minimum.reduceat(self.lows, starts)
+        self.highs = np.maximum.reduceat(self.highs, starts)
+        # keeps runs of one value exact instead of averaging them
+        self.means = np.where(self.lows == self.highs, self.lows, self.means)
+
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def value_at(self, rank: float) -> float:
+        """returns the estimated value at the given 0-based rank
+
+        """
+        after = np.cumsum(self.weights)
+        idx = min(int(np.searchsorted(after, rank, side="right")), len(after) - 1)
+        if self.lows[idx] == self.highs[idx]:
+            return float(self.means[idx])
+        # between the centres of the neighbouring centroids
+        centres = after - self.weights / 2
+        return float(np.interp(rank + 0.5, centres, self.means))
+
+    def median(self) -> float:
+        n = self.count()
+        if not n:
+            return float("nan")
+        return (self.value_at((n - 1) // 2) + self.value_at(n // 2)) / 2
+
+    def mode(self) -> float:
+        """returns the centroid with the highest density, which is the exact mode while the sketch is exact
+
+        """
+        if not len(self.means):
+            return float("nan")
+        resolution = (self.highs[-1] - self.lows[0]) / self.size or 1.0
+        return float(self.means[np.argmax(self.weights / (self.highs - self.lows + resolution))])
+
+
+class StreamingStats:
+    """Mergeable accumulator for the statistics of one series that is fed in chunks."""
+
+    def __init__(self, size: int = SKETCH_SIZE):
+        self.moments = Moments()
+        self.sketch = QuantileSketch(size)
+
+    def update(self, values: Union[np.ndarray, Iterable[float]]):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        self.moments.update(values)
+        self.sketch.update(values)
+
+    def merge(self, other: "StreamingStats"):
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+
+    def shift(self, offset: float):
+        self.moments.shift(offset)
+        self.sketch.shift(offset)
+
+    def describe(self, statistics=STATISTICS) -> dict:
+        """returns the same statistics as describe(), median and mode are estimated by the sketch
+
+        """
+        moments = self.moments
+        if not moments.n:
+            return {statistic: 0.0 if statistic == "count" else float("nan") for statistic in statistics}
+        described = {"count": float(moments.n),
+                     "min": float(moments.min),
+                     "max": float(moments.max),
+                     "median": self.sketch.median(),
+                     "mode": self.sketch.mode(),
+                     **moment_statistics(moments.n, moments.mean, moments.m2 / moments.n, moments.m3 / moments.n,
+                                         moments.m4 / moments.n)}
+        return {statistic: described[statistic] for statistic in statistics}
+
+
+class StreamingCaptureStats:
+    """Computes the Deltas/Lengths/Arrival times stats of a capture from consecutive chunks of packets.
+
+    Only the accumulators and the first and last timestamp are kept, so memory does not grow with the capture. Stats of
+    consecutive parts of one capture, e.g. computed by different workers, are combined with merge().
+    """
+
+    def __init__(self, size: int = SKETCH_SIZE):
+        self.deltas = StreamingStats(size)
+        self.lengths = StreamingStats(size)
+        self.arrival_times = StreamingStats(size)
+        self.first_time = None
+        self.last_time = None
+
+    def update(self, packets: Packets):
+        times = packets.times
+        if not len(times):
+            return
+        if self.first_time is None:
+            self.first_time = int(times[0])
+            deltas = np.diff(times)
+        else:
+            deltas = np.diff(times, prepend=self.last_time)
+        self.last_time = int(times[-1])
+
+        self.deltas.update(deltas / NS_PER_SECOND)
+        self.lengths.update(packets.lengths)
+        self.arrival_times.update((times - self.first_time) / NS_PER_SECOND)
+
+    def merge(self, other: "StreamingCaptureStats"):
+        """appends the stats of the part of the capture that directly follows this one
+
+        """
+        if other.first_time is None:
+            return
+        if self.first_time is None:
+            self.__dict__.update(copy.deepcopy(other.__dict__))
+            return
+
+        self.deltas.update([(other.first_time - self.last_time) / NS_PER_SECOND])
+        self.deltas.merge(other.deltas)
+        self.lengths.merge(other.lengths)
+        arrival_times = copy.deepcopy(other.arrival_times)
+        arrival_times.shift((other.first_time - self.first_time) / NS_PER_SECOND)
+        self.arrival_times.merge(arrival_times)
+        self.last_time = other.last_time
+
+    def get_stats(self) -> dict:
+        stats = {"Deltas": {},
+                 "Lengths": self.lengths.describe(),
+                 "Arrival times": self.arrival_times.describe(["min", "max", "median"])}
+        if self.first_time is not None:
+            # like PacketCapture.get_deltas, the first packet has a delta of 0
+            deltas = copy.deepcopy(self.deltas)
+            deltas.update([0.0])
+            stats["Deltas"] = deltas.describe()
+        return stats
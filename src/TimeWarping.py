@@ -0,0 +1,100 @@
+from src.lazy import lazy_import
+
+from functools import lru_cache
+from typing import Tuple, Union
+
+import math
+
+import numpy as np
+
+dtw = lazy_import("dtaidistance.dtw")
+
+
+@lru_cache(maxsize=None)
+def use_c() -> bool:
+    """returns whether the C implementation of dtaidistance is available, checked on first use
+
+    """
+    return bool(dtw.try_import_c())
+
+
+class TimeWarping:
+    """Dynamic time warping distance with an optional Sakoe-Chiba window and piecewise aggregate downsampling.
+
+    The distance is computed by the C implementation of dtaidistance if it is available. window is the width of the
+    Sakoe-Chiba band as a fraction of the longer series, length the number of points the longer series is reduced to
+    by averaging consecutive points (PAA). Both series are averaged over the same number of points, and the distance
+    is scaled back so that it stays comparable to the distance of the full series.
+    """
+
+    def __init__(self, window: Union[None, float] = None, length: Union[None, int] = None):
+        self.window = window
+        self.length = length
+
+    def prepare(self, s1, s2) -> Tuple[np.ndarray, np.ndarray, float, Union[None, int]]:
+        """returns the downsampled series, the factor to scale their distance by and the window in points
+
+        """
+        s1 = np.asarray(s1, dtype=np.float64)
+        s2 = np.asarray(s2, dtype=np.float64)
+        longest = max(len(s1), len(s2))
+        factor = 1
+        if self.length and longest > self.length:
+            factor = math.ceil(longest / self.length)
+            s1, s2 = self.paa(s1, factor), self.paa(s2, factor)
+            longest = max(len(s1), len(s2))
+        window = None if self.window is None else max(1, math.ceil(self.window * longest))
+        return s1, s2, math.sqrt(factor), window
+
+    def estimate_cost(self, n: int, m: int) -> float:
+        """returns the approximate number of cells the distance of series of length n and m has to fill
+
+        """
+        longest = max(n, m)
+        if self.length and longest > self.length:
+            factor = math.ceil(longest / self.length)
+            n, m, longest = math.ceil(n / factor), math.ceil(m / factor), math.ceil(longest / factor)
+        if self.window is None:
+            return float(n * m)
+        return float(min(n, m) * min(max(n, m), 2 * math.ceil(self.window * longest) + abs(n - m)))
+
+    @staticmethod
+    def paa(series: np.ndarray, factor: int) -> np.ndarray:
+        """returns the means of every factor consecutive points
+
+        """
+        starts = np.arange(0, len(series), factor)
+        return np.add.reduceat(series, starts) / np.diff(np.append(starts, len(series)))
+
+    def distance(self, s1, s2, max_dist: Union[None, float] = None) -> float:
+        """returns the dtw distance, or inf once it is known to exceed max_dist
+
+        """
+        s1, s2, scale, window = self.prepare(s1, s2)
+        if max_dist is not None and self.bound(s1, s2, window) * scale > max_dist:
+            return math.inf
+        return dtw.distance(s1, s2, window=window, use_c=use_c(),
+                            max_dist=None if max_dist is None else max_dist / scale) * scale
+
+    def lower_bound(self, s1, s2) -> float:
+        """returns a lower bound of distance(), the larger of LB_Kim and LB_Keogh
+
+        """
+        s1, s2, scale, window = self.prepare(s1, s2)
+        return self.bound(s1, s2, window) * scale
+
+    @classmethod
+    def bound(cls, s1: np.ndarray, s2: np.ndarray, window: Union[None, int]) -> float:
+        if not len(s1) or not len(s2):
+            return 0.0
+        return max(cls.lb_kim(s1, s2), dtw.lb_keogh(s1, s2, window=window, use_c=use_c()))
+
+    @staticmethod
+    def lb_kim(s1: np.ndarray, s2: np.ndarray) -> float:
+        """returns the distance of the first and the last points, which every warping path has to match
+
+        """
+        first = (s1[0] - s2[0]) ** 2
+        if len(s1) == 1 and len(s2) == 1:
+            return math.sqrt(first)
+        return math.sqrt(first + (s1[-1] - s2[-1]) ** 2)
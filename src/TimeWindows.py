@@ -0,0 +1,122 @@
+from src.datamodel.Packet import NS_PER_SECOND
+
+from typing import Dict, Union
+
+import numpy as np
+
+# a window's sum of squares from prefix sums is only trusted if it is not tiny against the prefix it is taken from
+RELATIVE_TOLERANCE = 1e-6
+CHUNK_VALUES = 1 << 22
+
+
+class TimeWindows:
+    """Statistics of the packets in sliding or tumbling time windows.
+
+    The packets are ordered by time first, stably, so captures with out of order timestamps get the same windows as
+    sorted ones. The deltas are the differences between packets consecutive in time, and a delta belongs to a window
+    if both of its packets do. Windows start at the earliest packet and every step seconds after it, cover size
+    seconds and are closed at the start and open at the end. With step equal to size (the default) the windows are
+    tumbling.
+
+    Integer prefix sums of the lengths and of the deltas in ns give exact counts, sums and means of every window in
+    constant time. The sums of squares come from prefix sums around the overall mean, and are summed again directly
+    over the window's own values wherever they are too small against the prefix to be free of cancellation.
+    """
+
+    def __init__(self, times: np.ndarray, lengths: np.ndarray):
+        times = np.asarray(times, dtype=np.int64)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        if np.any(np.diff(times) < 0):
+            order = np.argsort(times, kind="stable")
+            times, lengths = times[order], lengths[order]
+        self.times = times
+        self.length_values = lengths
+        self.delta_values = np.diff(times)
+        self.lengths = prefix_sums(self.length_values)
+        self.deltas = prefix_sums(self.delta_values)
+        # the shift by the mean keeps the sums of squares from growing with the mean
+        self.length_shift = lengths.mean() if len(lengths) else 0.0
+        self.delta_shift = self.delta_values.mean() if len(self.delta_values) else 0.0
+        self.shifted_lengths = prefix_sums((lengths - self.length_shift) ** 2)
+        self.shifted_deltas = prefix_sums((self.delta_values - self.delta_shift) ** 2)
+
+    def get_bounds(self, size: float, step: Union[None, float] = None):
+        """returns the start in ns and the first and the end packet index of every window
+
+        """
+        size_ns = round(size * NS_PER_SECOND)
+        step_ns = round((step or size) * NS_PER_SECOND)
+        if size_ns <= 0 or step_ns <= 0:
+            raise ValueError("window size and step have to be positive")
+        if not len(self.times):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        starts = np.arange(self.times.min(), self.times.max() + 1, step_ns, dtype=np.int64)
+        return starts, np.searchsorted(self.times, starts, "left"), np.searchsorted(self.times, starts + size_ns,
+                                                                                     "left")
+
+    def get_windows(self, size: float, step: Union[None, float] = None) -> Dict[str, np.ndarray]:
+        """returns per window the start in seconds relative to the first packet, the packet and byte counts and rates
+        and the mean and sample standard deviation of the lengths and deltas
+
+        """
+        starts, first, end = self.get_bounds(size, step)
+        count = end - first
+        total_length = self.lengths[end] - self.lengths[first]
+        # the deltas between the packets first..end-1 are the deltas number first..end-2
+        delta_end = np.maximum(end - 1, first)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            length_mean, length_std = moments(self.length_values, self.lengths, self.shifted_lengths,
+                                              self.length_shift, first, end)
+            delta_mean, delta_std = moments(self.delta_values, self.deltas, self.shifted_deltas, self.delta_shift,
+                                            first, delta_end)
+        return {"Start": (starts - starts[0]) / NS_PER_SECOND if len(starts) else np.zeros(0),
+                "Number of packets": count,
+                "Length of all packets in kbit": total_length * 8 / 1000,
+                "Packets per second": count / size,
+                "Rate in kbit/s": total_length * 8 / 1000 / size,
+                "Length mean": length_mean,
+                "Length std": length_std,
+                "Delta mean": delta_mean / NS_PER_SECOND,
+                "Delta std": delta_std / NS_PER_SECOND}
+
+
+def prefix_sums(values: np.ndarray) -> np.ndarray:
+    """returns the sums of the first 0..n values, exact for integers
+
+    """
+    return np.concatenate((np.zeros(1, dtype=values.dtype), np.cumsum(values)))
+
+
+def moments(values: np.ndarray, sums: np.ndarray, shifted_squares: np.ndarray, shift: float, first: np.ndarray,
+            end: np.ndarray):
+    """returns the means and sample standard deviations of the values first..end-1 of every window
+
+    """
+    count = end - first
+    mean = (sums[end] - sums[first]) / count
+    # sum((x - mean)^2) = sum((x - shift)^2) - n * (mean - shift)^2
+    squares = shifted_squares[end] - shifted_squares[first] - count * (mean - shift) ** 2
+    unreliable = (count > 1) & (squares <= RELATIVE_TOLERANCE * shifted_squares[end])
+    if np.any(unreliable):
+        squares[unreliable] = window_squares(values, first[unreliable], end[unreliable], mean[unreliable])
+    squares = np.maximum(squares, 0)
+    return mean, np.where(count > 1, np.sqrt(squares / (count - 1)), np.nan)
+
+
+def window_squares(values: np.ndarray, first: np.ndarray, end: np.ndarray, mean: np.ndarray) -> np.ndarray:
+    """returns the sums of the squared deviations of the values first..end-1 from their mean, summed directly
+
+    """
+    squares = np.zeros(len(first))
+    counts = end - first
+    lower = 0
+    while lower < len(first):
+        # at most about CHUNK_VALUES values are gathered at once, overlapping windows gather a value repeatedly
+        upper = max(lower + 1, int(np.searchsorted(np.cumsum(counts[lower:]), CHUNK_VALUES, "right")) + lower)
+        chunk = counts[lower:upper]
+        windows = np.repeat(np.arange(len(chunk)), chunk)
+        offsets = np.arange(len(windows)) - np.repeat(np.cumsum(chunk) - chunk, chunk)
+        deviations = values[np.repeat(first[lower:upper], chunk) + offsets] - mean[lower:upper][windows]
+        squares[lower:upper] = np.bincount(windows, weights=deviations * deviations, minlength=len(chunk))
+        lower = upper
+    return squares
@@ -6,12 +6,20 @@ class UnanimityVoter:
     def vote(self) -> bool:
         for metric, metric_values in self.results.items():
             for feature, value in metric_values.items():
-                # Check if metrics are p-value based metrics
-                if metric in ["Chi_squared_test", "Kolmogorov_smirnov_test"]:
-                    if value < self.thresholds[metric]:
-                        return False
-                # Check if metrics are distance based metrics
-                elif metric in ["Earth_mover_distance", "Dynamic_time_warping"]:
-                    if value > self.thresholds[metric]:
-                        return False
+                if not self.passes(metric, value):
+                    return False
+        return True
+
+    def passes(self, metric: str, value: float) -> bool:
+        """returns whether a single metric value is within its threshold
+
+        """
+        # Check if metrics are p-value based metrics
+        if metric in ["Chi_squared_test", "Kolmogorov_smirnov_test"]:
+            if value < self.thresholds[metric]:
+                return False
+        # Check if metrics are distance based metrics
+        elif metric in ["Earth_mover_distance", "Dynamic_time_warping"]:
+            if value > self.thresholds[metric]:
+                return False
         return True
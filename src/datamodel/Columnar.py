@@ -0,0 +1,119 @@
+from src.datamodel.Packet import Packets
+from src.profiling import profiled
+
+from pathlib import Path
+from typing import Iterator, Union
+import json
+import mmap
+import struct
+import zlib
+
+import numpy as np
+
+COLUMNAR_SUFFIX = ".pcol"
+COLUMNAR_MAGIC = b"PCOL"
+COLUMNAR_VERSION = 1
+# magic, format version, length of the json header
+PREAMBLE = struct.Struct("<4sHI")
+ALIGNMENT = 64
+CHUNK_PACKETS = 1 << 20
+
+COLUMNS = ["times", "lengths", "src_ips", "src_ports", "dst_ips", "dst_ports", "versions", "types"]
+
+
+class UnsupportedColumnarFile(Exception):
+    """Raised for files that are not columnar captures of a supported format version."""
+
+
+class ColumnarWriter:
+    """Writes a Packets table as a columnar capture.
+
+    The file starts with a small preamble and a json header holding the packet count, the ip and type tables and
+    the dtype, offset and size of every column. The little-endian column arrays follow, each aligned to 64 bytes.
+    Compressed columns are deflated with zlib, uncompressed ones can be mapped into memory as they are.
+    """
+
+    def __init__(self, file: Union[str, Path], compression_level: int = 0):
+        self.file = Path(file)
+        self.compression_level = compression_level
+
+    @profiled("write output")
+    def write(self, packets: Packets):
+        blobs = []
+        columns = []
+        offset = 0
+        for name in COLUMNS:
+            values = getattr(packets, name)
+            data = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder("<")).tobytes()
+            if self.compression_level:
+                data = zlib.compress(data, self.compression_level)
+            offset = align(offset)
+            columns.append({"name": name, "dtype": values.dtype.newbyteorder("<").str, "offset": offset,
+                            "size": len(data), "compressed": bool(self.compression_level)})
+            blobs.append((offset, data))
+            offset += len(data)
+
+        header = json.dumps({"count": len(packets), "columns": columns, "ip_table": packets.ip_table,
+                             "type_table": packets.type_table}).encode()
+        data_start = align(PREAMBLE.size + len(header))
+        with self.file.open("wb") as f:
+            f.write(PREAMBLE.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION, len(header)))
+            f.write(header)
+            for column_offset, data in blobs:
+                f.seek(data_start + column_offset)
+                f.write(data)
+            f.truncate(data_start + offset)
+
+
+class ColumnarReader:
+    """Loads a columnar capture written by ColumnarWriter.
+
+    Uncompressed columns are views into a read-only memory map of the file, so loading only parses the header.
+    """
+
+    def __init__(self, file: Union[str, Path], memory_map: bool = True):
+        self.file = Path(file)
+        self.memory_map = memory_map
+
+    def read(self) -> Packets:
+        with self.file.open("rb") as f:
+            preamble = f.read(PREAMBLE.size)
+            if len(preamble) < PREAMBLE.size:
+                raise UnsupportedColumnarFile(f"{self.file} is too short for a columnar capture")
+            magic, version, header_length = PREAMBLE.unpack(preamble)
+            if magic != COLUMNAR_MAGIC or version != COLUMNAR_VERSION:
+                raise UnsupportedColumnarFile(f"{self.file} is not a columnar capture of version "
+                                              f"{COLUMNAR_VERSION}")
+            header = json.loads(f.read(header_length))
+            data_start = align(PREAMBLE.size + header_length)
+
+            if self.memory_map and header["count"]:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = f.read()
+                data_start -= PREAMBLE.size + header_length
+
+        arrays = {}
+        for column in header["columns"]:
+            start = data_start + column["offset"]
+            if column["compressed"]:
+                data = zlib.decompress(buffer[start:start + column["size"]])
+                values = np.frombuffer(data, dtype=column["dtype"])
+            else:
+                values = np.frombuffer(buffer, dtype=column["dtype"], count=column["size"] // np.dtype(
+                    column["dtype"]).itemsize, offset=start)
+            arrays[column["name"]] = values
+        return Packets(**arrays, ip_table=header["ip_table"], type_table=header["type_table"])
+
+    def iter_packets(self, chunk_packets: int = CHUNK_PACKETS) -> Iterator[Packets]:
+        """yields the packets in slices of chunk_packets, which share the ip and type tables
+
+        """
+        packets = self.read()
+        for start in range(0, len(packets), chunk_packets):
+            yield Packets(*(getattr(packets, name)[start:start + chunk_packets] for name in COLUMNS),
+                          packets.ip_table, packets.type_table)
+
+
+def align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
@@ -1,63 +1,263 @@
-from src.datamodel.Packet import Packet, Packets
+from src.datamodel.Packet import Packets, PacketsBuilder, NS_PER_SECOND, decimal_to_ns, factorize_rows
 
 from decimal import Decimal, InvalidOperation
 from pathlib import Path
-from typing import Dict, List, Union
+from typing import Callable, Dict, Iterator, Tuple, Union
+
+import numpy as np
+
+CHUNK_SIZE = 1 << 23
+MAX_FIELD_WIDTH = 64
+MAX_DIGITS = 18
+PADDING = MAX_FIELD_WIDTH
+
+NEWLINE = ord("\n")
+SEPARATOR = ord(";")
+DOT = ord(".")
+WHITESPACE = [ord(c) for c in " \t\r\v\f"]
+
+POWERS_OF_TEN = 10 ** np.arange(19, dtype=np.int64)
+MAX_SECONDS = (np.iinfo(np.int64).max - NS_PER_SECOND) // NS_PER_SECOND
 
 
 class MinLogReader:
-    def __init__(self, min_log: Union[str, Path]):
+    """Reads ';'-separated MinLog files.
+
+    The file is read in chunks and every chunk is split and parsed column-wise with numpy. Only fields that are not
+    plain numbers fall back to int()/Decimal, so malformed values are still coerced to 0 like before.
+    """
+
+    def __init__(self, min_log: Union[str, Path], chunk_size: int = CHUNK_SIZE):
         self.file = Path(min_log)
+        self.chunk_size = chunk_size
 
     def read(self) -> Packets:
-        def extract_int(key: str, _dict: dict, default: int = 0) -> int:
-            try:
-                return int(_dict.get(key, default))
-            except ValueError:
-                return 0
-
-        with self.file.open("r") as f:
-            content = [line.rstrip() for line in f.readlines()]
-
-        headers = content[0].split(";")
-        content = [c.split(";") for c in content[1:]]
-
-        packets = []
-        for pkt in self.extract_packets(content, headers):
-            try:
-                _time = Decimal(pkt.get("Time", 0))
-            except InvalidOperation:
-                _time = Decimal(0)
-            _srcIp = pkt.get("SrcIP", "")
-            _srcPort = extract_int("SrcPort", pkt)
-            _dstIp = pkt.get("DstIP", "")
-            _dstPort = extract_int("DstPort", pkt)
-            _ipv = extract_int("IPv", pkt, 4)
-            _type = pkt.get("Type", "")
-            _size = extract_int("Size", pkt)
-
-            packet = Packet(
-                _time,
-                _srcIp,
-                _srcPort,
-                _dstIp,
-                _dstPort,
-                _ipv,
-                _type,
-                _size
-            )
-            packets.append(packet)
-
-        return Packets(packets)
+        builder = PacketsBuilder()
+        for chunk, columns in self.iter_lines():
+            self.parse_chunk(chunk, columns, builder)
+        return builder.build()
+
+    def iter_packets(self) -> Iterator[Packets]:
+        """yields the packets chunk by chunk, every chunk is a Packets table of its own
+
+        """
+        for chunk, columns in self.iter_lines():
+            builder = PacketsBuilder()
+            self.parse_chunk(chunk, columns, builder)
+            yield builder.build()
+
+    def iter_lines(self) -> Iterator[Tuple[bytes, Dict[str, int]]]:
+        """yields blocks of complete lines after the header together with the column of every header
+
+        """
+        with self.file.open("rb") as f:
+            header = f.readline()
+            if not header:
+                return
+            columns = self.map_headers(header.decode().rstrip().split(";"))
+            yield from ((chunk, columns) for chunk in self.iter_chunks(f))
+
+    @staticmethod
+    def map_headers(headers: list) -> Dict[str, int]:
+        return {header: idx for idx, header in enumerate(headers)}
+
+    def iter_chunks(self, f) -> Iterator[bytes]:
+        """yields blocks of complete lines
+
+        """
+        tail = b""
+        while True:
+            data = f.read(self.chunk_size)
+            if not data:
+                if tail:
+                    yield tail
+                return
+            data = tail + data
+            cut = data.rfind(b"\n") + 1
+            if cut:
+                yield data[:cut]
+            tail = data[cut:]
+
+    def parse_chunk(self, chunk: bytes, columns: Dict[str, int], builder: PacketsBuilder):
+        fields = FieldSplitter(chunk)
+
+        times = self.parse_column(fields, columns.get("Time"), self.parse_times, self.parse_time, 0, np.int64)
+        src_ips = self.intern_column(fields, columns.get("SrcIP"), builder.intern_ip)
+        src_ports = self.parse_column(fields, columns.get("SrcPort"), self.parse_integers, self.parse_int, 0,
+                                      np.uint16)
+        dst_ips = self.intern_column(fields, columns.get("DstIP"), builder.intern_ip)
+        dst_ports = self.parse_column(fields, columns.get("DstPort"), self.parse_integers, self.parse_int, 0,
+                                      np.uint16)
+        versions = self.parse_column(fields, columns.get("IPv"), self.parse_integers, self.parse_int, 4, np.uint8)
+        types = self.intern_column(fields, columns.get("Type"), builder.intern_type)
+        sizes = self.parse_column(fields, columns.get("Size"), self.parse_integers, self.parse_int, 0, np.uint32)
+
+        builder.extend(times, sizes, src_ips, src_ports, dst_ips, dst_ports, versions, types)
+
+    @staticmethod
+    def parse_column(fields: "FieldSplitter", column: Union[int, None],
+                     parse_vectorized: Callable[["FieldSplitter", np.ndarray, np.ndarray],
+                                                Tuple[np.ndarray, np.ndarray]],
+                     parse_single: Callable[[str], int], default: int, dtype: type) -> np.ndarray:
+        """parses a numeric column, rows without the column get the default
+
+        Values that do not fit into the column type are coerced to 0 like malformed ones.
+        """
+        values = np.full(fields.lines, default, dtype=np.int64)
+        if column is None:
+            return values
+        limits = np.iinfo(dtype)
+        present, start, end = fields.column(column)
+        start, end = start[present], end[present]
+        parsed, ok = parse_vectorized(fields, start, end)
+        for idx in np.flatnonzero(~ok).tolist():
+            value = parse_single(fields.text(start[idx], end[idx]))
+            parsed[idx] = value if limits.min <= value <= limits.max else 0
+        parsed[(parsed < limits.min) | (parsed > limits.max)] = 0
+        values[present] = parsed
+        return values
+
+    @staticmethod
+    def intern_column(fields: "FieldSplitter", column: Union[int, None], intern: Callable[[str], int]) -> np.ndarray:
+        """maps a string column to interned ids, rows without the column get the empty string
+
+        """
+        ids = np.full(fields.lines, intern(""), dtype=np.int64)
+        if column is None:
+            return ids
+        present, start, end = fields.column(column)
+        start, end = start[present], end[present]
+
+        values = np.empty(len(start), dtype=np.int64)
+        short = end - start <= MAX_FIELD_WIDTH
+        if short.any():
+            keys = fields.left_aligned(start[short], end[short])
+            first, inverse = factorize_rows(keys)
+            values[short] = np.array([intern(key.tobytes().rstrip(b"\0").decode()) for key in keys[first]],
+                                     dtype=np.int64)[inverse]
+        for idx in np.flatnonzero(~short).tolist():
+            values[idx] = intern(fields.text(start[idx], end[idx]))
+        ids[present] = values
+        return ids
 
     @staticmethod
-    def extract_packets(content: List[List[str]], headers: list) -> List[Dict[str, str]]:
-        packets = []
+    def parse_int(value: str) -> int:
+        try:
+            return int(value)
+        except ValueError:
+            return 0
+
+    @staticmethod
+    def parse_time(value: str) -> int:
+        try:
+            return decimal_to_ns(Decimal(value))
+        except (InvalidOperation, ValueError, OverflowError):
+            return 0
+
+    @staticmethod
+    def parse_integers(fields: "FieldSplitter", start: np.ndarray, end: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """parses fields consisting only of digits, returns the values and which fields could be parsed
+
+        """
+        width = end - start
+        max_width = min(max(int(width.max(initial=0)), 1), MAX_DIGITS)
+        # right-aligned, so every column has a fixed power of ten
+        digits = fields.right_aligned(end, max_width) - ord("0")
+        in_field = np.arange(max_width) >= (max_width - width)[:, None]
+        ok = (width > 0) & (width <= MAX_DIGITS) & ((digits < 10) | ~in_field).all(axis=1)
+        values = np.where(in_field, digits, 0).astype(np.int64) @ POWERS_OF_TEN[max_width - 1::-1]
+        return values, ok
+
+    @classmethod
+    def parse_times(cls, fields: "FieldSplitter", start: np.ndarray, end: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """parses plain decimal timestamps in seconds to nanoseconds, returns the values and which could be parsed
+
+        """
+        dot = fields.find(DOT, start, end)
+        has_dot = dot < end
+        seconds, ok = cls.parse_integers(fields, start, dot)
+        ok &= seconds <= MAX_SECONDS
+
+        fraction = np.zeros(len(start), dtype=np.int64)
+        if has_dot.any():
+            fraction_start, fraction_end = dot[has_dot] + 1, end[has_dot]
+            fraction_digits = fraction_end - fraction_start
+            fraction[has_dot], fraction_ok = cls.parse_integers(fields, fraction_start, fraction_end)
+            fraction[has_dot] *= POWERS_OF_TEN[np.clip(9 - fraction_digits, 0, 9)]
+            ok[has_dot] &= fraction_ok & (fraction_digits <= 9)
+
+        return np.where(ok, seconds, 0) * NS_PER_SECOND + fraction, ok
+
+
+class FieldSplitter:
+    """Locates the lines and ';'-separated fields of a block of complete lines."""
+
+    def __init__(self, chunk: bytes):
+        self.data = np.frombuffer(chunk, dtype=np.uint8)
+        data = self.data
+        # fields are read through fixed width windows, the padding keeps them inside the buffer
+        self.padded = np.concatenate((np.zeros(PADDING, np.uint8), data, np.zeros(PADDING, np.uint8)))
+
+        line_ends = np.flatnonzero(data == NEWLINE)
+        if len(data) and data[-1] != NEWLINE:
+            line_ends = np.append(line_ends, len(data))
+        self.lines = len(line_ends)
+        self.line_starts = np.concatenate(([0], line_ends[:-1] + 1)).astype(np.int64)
+
+        # lines are right-stripped like str.rstrip() before they are split
+        self.line_ends = line_ends.astype(np.int64)
+        trailing = self.line_ends > self.line_starts
+        while trailing.any():
+            trailing &= np.isin(data[np.maximum(self.line_ends - 1, 0)], WHITESPACE)
+            self.line_ends[trailing] -= 1
+            trailing &= self.line_ends > self.line_starts
+
+        self.separators = np.flatnonzero(data == SEPARATOR)
+        self.first_separator = np.searchsorted(self.separators, self.line_starts)
+        self.separator_count = np.diff(np.append(self.first_separator, len(self.separators)))
+
+    def column(self, column: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """returns which lines have the column and the start and end of the field in every line
+
+        """
+        present = self.separator_count >= column
+        last = max(len(self.separators) - 1, 0)
+        separators = self.separators if len(self.separators) else np.zeros(1, dtype=np.int64)
+        if column == 0:
+            start = self.line_starts
+        else:
+            start = separators[np.minimum(self.first_separator + column - 1, last)] + 1
+        end = np.where(self.separator_count > column,
+                       separators[np.minimum(self.first_separator + column, last)], self.line_ends)
+        return present, start, end
+
+    def find(self, char: int, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """returns the position of the first occurrence of char in every field, or the field end if there is none
+
+        """
+        positions = np.flatnonzero(self.data == char)
+        if not len(positions):
+            return end.copy()
+        found = positions[np.minimum(np.searchsorted(positions, start), len(positions) - 1)]
+        return np.where((found >= start) & (found < end), found, end)
+
+    def left_aligned(self, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """returns the fields as rows of a zero-padded byte matrix
+
+        """
+        width = max(int((end - start).max(initial=0)), 1)
+        rows = self.windows(width)[start + PADDING]
+        rows[np.arange(width) >= (end - start)[:, None]] = 0
+        return rows
+
+    def right_aligned(self, end: np.ndarray, width: int) -> np.ndarray:
+        """returns the last width bytes before every field end as rows of a byte matrix
+
+        """
+        return self.windows(width)[end + PADDING - width]
 
-        for c in content:
-            content_dict = {}
-            for idx, value in enumerate(c):
-                content_dict[headers[idx]] = value
-            packets.append(content_dict)
+    def windows(self, width: int) -> np.ndarray:
+        return np.lib.stride_tricks.sliding_window_view(self.padded, width)
 
-        return packets
+    def text(self, start: int, end: int) -> str:
+        return self.data[start:end].tobytes().decode()
@@ -1,7 +1,50 @@
+from array import array
 from dataclasses import dataclass
 from decimal import Decimal
 
-from typing import List
+from typing import Dict, List, Sequence, Tuple, Union, overload
+
+import numpy as np
+
+NS_PER_SECOND = 1_000_000_000
+
+
+def decimal_to_ns(time: Union[Decimal, int, str]) -> int:
+    """converts a timestamp in seconds to integer nanoseconds
+
+    """
+    return int(Decimal(time).scaleb(9).to_integral_value())
+
+
+def ns_to_decimal(time_ns: int) -> Decimal:
+    """converts integer nanoseconds to an exact timestamp in seconds
+
+    """
+    return Decimal(int(time_ns)).scaleb(-9)
+
+
+def factorize_rows(rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """groups equal rows of a byte matrix, returns the index of the first row of every group and the group of every row
+
+    Rows are grouped by a 64 bit hash, which is a lot faster than sorting the raw bytes. Should two different rows
+    ever share a hash, the raw bytes are grouped instead.
+    """
+    width = -(-rows.shape[1] // 8) * 8
+    words = np.zeros((len(rows), width), dtype=np.uint8)
+    words[:, :rows.shape[1]] = rows
+    words = words.view(np.uint64)
+
+    hashes = words[:, 0].copy()
+    for column in range(1, words.shape[1]):
+        hashes = hashes * np.uint64(0x9e3779b97f4a7c15) + words[:, column]
+
+    _, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    if not (words[first][inverse] == words).all():
+        _, first, inverse = np.unique(np.ascontiguousarray(rows).view(f"V{rows.shape[1]}").reshape(-1),
+                                      return_index=True, return_inverse=True)
+        inverse = inverse.reshape(-1)
+    return first, inverse
 
 
 @dataclass
@@ -17,8 +60,150 @@ class Packet:
 
 
 class Packets:
-    def __init__(self, packets: List[Packet]):
-        self.packets = packets
+    """Columnar packet table.
+
+    Every packet field is stored in its own typed numpy column. IP addresses and layer types are interned: the
+    ``src_ips``/``dst_ips`` and ``types`` columns hold indices into ``ip_table`` and ``type_table``.
+    """
+
+    def __init__(self, times: np.ndarray, lengths: np.ndarray, src_ips: np.ndarray, src_ports: np.ndarray,
+                 dst_ips: np.ndarray, dst_ports: np.ndarray, versions: np.ndarray, types: np.ndarray,
+                 ip_table: List[str], type_table: List[str]):
+        self.times = np.asarray(times, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.uint32)
+        self.src_ips = np.asarray(src_ips, dtype=np.int32)
+        self.src_ports = np.asarray(src_ports, dtype=np.uint16)
+        self.dst_ips = np.asarray(dst_ips, dtype=np.int32)
+        self.dst_ports = np.asarray(dst_ports, dtype=np.uint16)
+        self.versions = np.asarray(versions, dtype=np.uint8)
+        self.types = np.asarray(types, dtype=np.uint16)
+        self.ip_table = ip_table
+        self.type_table = type_table
+
+    @classmethod
+    def from_packets(cls, packets: List[Packet]) -> "Packets":
+        builder = PacketsBuilder()
+        for pkt in packets:
+            builder.append(decimal_to_ns(pkt.time), pkt.srcIp, pkt.srcPort, pkt.dstIp, pkt.dstPort, pkt.IPv,
+                           pkt.type, pkt.length)
+        return builder.build()
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def get_packets(self) -> "PacketView":
+        return PacketView(self)
+
+    def get_src_ip_strings(self) -> np.ndarray:
+        return np.asarray(self.ip_table, dtype=object)[self.src_ips]
+
+    def get_dst_ip_strings(self) -> np.ndarray:
+        return np.asarray(self.ip_table, dtype=object)[self.dst_ips]
+
+    def lookup_ips(self, ips: Sequence[str]) -> np.ndarray:
+        """returns the ids of the given ip addresses, ignoring addresses that do not occur in the table
+
+        """
+        ip_ids = {ip: idx for idx, ip in enumerate(self.ip_table)}
+        return np.array([ip_ids[ip] for ip in ips if ip in ip_ids], dtype=np.int32)
+
+    def get_packet(self, index: int) -> Packet:
+        return Packet(ns_to_decimal(self.times[index]),
+                      self.ip_table[self.src_ips[index]],
+                      int(self.src_ports[index]),
+                      self.ip_table[self.dst_ips[index]],
+                      int(self.dst_ports[index]),
+                      int(self.versions[index]),
+                      self.type_table[self.types[index]],
+                      int(self.lengths[index]))
+
+
+class PacketView(Sequence[Packet]):
+    """Read-only sequence of Packet objects, materialized on access from a Packets table."""
+
+    def __init__(self, packets: Packets):
+        self.table = packets
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    @overload
+    def __getitem__(self, index: int) -> Packet: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Packet]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.table.get_packet(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("packet index out of range")
+        return self.table.get_packet(index)
+
+
+class PacketsBuilder:
+    """Collects packets field by field and builds a Packets table without creating per-packet objects."""
+
+    def __init__(self):
+        self.times = array("q")
+        self.lengths = array("I")
+        self.src_ips = array("i")
+        self.src_ports = array("H")
+        self.dst_ips = array("i")
+        self.dst_ports = array("H")
+        self.versions = array("B")
+        self.types = array("H")
+
+        self.ip_table = []
+        self.type_table = []
+        self._ip_ids: Dict[str, int] = {}
+        self._type_ids: Dict[str, int] = {}
+
+    def intern_ip(self, ip: str) -> int:
+        ip_id = self._ip_ids.get(ip)
+        if ip_id is None:
+            ip_id = self._ip_ids[ip] = len(self.ip_table)
+            self.ip_table.append(ip)
+        return ip_id
+
+    def intern_type(self, _type: str) -> int:
+        type_id = self._type_ids.get(_type)
+        if type_id is None:
+            type_id = self._type_ids[_type] = len(self.type_table)
+            self.type_table.append(_type)
+        return type_id
+
+    def append(self, time_ns: int, src_ip: str, src_port: int, dst_ip: str, dst_port: int, version: int,
+               _type: str, length: int):
+        self.times.append(time_ns)
+        self.lengths.append(length)
+        self.src_ips.append(self.intern_ip(src_ip))
+        self.src_ports.append(src_port)
+        self.dst_ips.append(self.intern_ip(dst_ip))
+        self.dst_ports.append(dst_port)
+        self.versions.append(version)
+        self.types.append(self.intern_type(_type))
+
+    def extend(self, times: np.ndarray, lengths: np.ndarray, src_ips: np.ndarray, src_ports: np.ndarray,
+               dst_ips: np.ndarray, dst_ports: np.ndarray, versions: np.ndarray, types: np.ndarray):
+        """appends whole columns at once, ip and type columns must already hold interned ids
+
+        """
+        for column, values in ((self.times, times), (self.lengths, lengths), (self.src_ips, src_ips),
+                               (self.src_ports, src_ports), (self.dst_ips, dst_ips), (self.dst_ports, dst_ports),
+                               (self.versions, versions), (self.types, types)):
+            column.frombytes(np.ascontiguousarray(values, dtype=column.typecode).tobytes())
 
-    def get_packets(self) -> List[Packet]:
-        return self.packets
+    def build(self) -> Packets:
+        return Packets(np.array(self.times, dtype=np.int64),
+                       np.array(self.lengths, dtype=np.uint32),
+                       np.array(self.src_ips, dtype=np.int32),
+                       np.array(self.src_ports, dtype=np.uint16),
+                       np.array(self.dst_ips, dtype=np.int32),
+                       np.array(self.dst_ports, dtype=np.uint16),
+                       np.array(self.versions, dtype=np.uint8),
+                       np.array(self.types, dtype=np.uint16),
+                       self.ip_table,
+                       self.type_table)
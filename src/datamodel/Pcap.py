@@ -1,32 +1,61 @@
-from src.datamodel.Packet import Packet, Packets
+from src.datamodel.Packet import Packets, PacketsBuilder, decimal_to_ns
+from src.datamodel.PcapReader import MappedPcapReader, PcapReader, UnsupportedCapture
 
 from pathlib import Path
 from decimal import Decimal
-from scapy.all import rdpcap
-from scapy.layers.inet import UDP, TCP
+from typing import Iterator
 
 
 class Pcap:
-    def __init__(self, file: Path):
+    def __init__(self, file: Path, memory_map: bool = True):
         self.file = file
+        self.memory_map = memory_map
 
     def read(self) -> Packets:
-        packets = []
+        reader = MappedPcapReader if self.memory_map else PcapReader
+        try:
+            return reader(self.file).read()
+        except UnsupportedCapture:
+            return self.read_with_scapy()
+
+    def iter_packets(self) -> Iterator[Packets]:
+        """yields the packets chunk by chunk without keeping the whole capture in memory
+
+        Captures only scapy can read are read as a whole and yielded as one chunk.
+        """
+        packets = PcapReader(self.file).iter_packets()
+        try:
+            first = next(packets, None)
+        except UnsupportedCapture:
+            yield self.read_with_scapy()
+            return
+        if first is not None:
+            yield first
+            yield from packets
+
+    def read_with_scapy(self) -> Packets:
+        """fallback for captures the native reader does not understand, dissects every packet with scapy
+
+        """
+        from scapy.all import rdpcap
+
+        builder = PacketsBuilder()
         for pkt in rdpcap(str(self.file)):
-            packet = Packet(Decimal(pkt.time),
-                            str(pkt.src),
-                            int(pkt.sport),
-                            str(pkt.dst),
-                            int(pkt.dport),
-                            int(pkt.version),
-                            self.determine_layer_type(pkt),
-                            len(pkt)
-                            )
-            packets.append(packet)
-        return Packets(packets)
+            builder.append(decimal_to_ns(Decimal(pkt.time)),
+                           str(pkt.src),
+                           int(pkt.sport),
+                           str(pkt.dst),
+                           int(pkt.dport),
+                           int(pkt.version),
+                           self.determine_layer_type(pkt),
+                           len(pkt)
+                           )
+        return builder.build()
 
     @staticmethod
     def determine_layer_type(pkt) -> str:
+        from scapy.layers.inet import UDP, TCP
+
         if pkt.haslayer(UDP):
             return "UDP"
         elif pkt.haslayer(TCP):
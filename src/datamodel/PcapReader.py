@@ -0,0 +1,542 @@
+from src.datamodel.Packet import Packets, PacketsBuilder, NS_PER_SECOND
+
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, Union
+import mmap
+import socket
+import struct
+
+import numpy as np
+
+CHUNK_SIZE = 1 << 22
+BATCH_RECORDS = 1 << 20
+
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1000),
+    b"\xa1\xb2\xc3\xd4": (">", 1000),
+    b"\x4d\x3c\xb2\xa1": ("<", 1),
+    b"\xa1\xb2\x3c\x4d": (">", 1),
+}
+PCAPNG_MAGIC = b"\x0a\x0d\x0d\x0a"
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = (12, 14, 101)
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+SUPPORTED_LINKTYPES = (LINKTYPE_NULL, LINKTYPE_ETHERNET, *LINKTYPE_RAW, LINKTYPE_LOOP, LINKTYPE_LINUX_SLL,
+                       LINKTYPE_IPV4, LINKTYPE_IPV6, LINKTYPE_LINUX_SLL2)
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86dd
+ETHERTYPE_VLAN = (0x8100, 0x88a8, 0x9100)
+
+IPV6_EXTENSION_HEADERS = (0, 43, 60)
+IPV6_FRAGMENT_HEADER = 44
+
+
+class UnsupportedCapture(Exception):
+    """Raised for captures the native reader cannot decode, e.g. unusual link types."""
+
+
+class RecordBatch:
+    """Location and timestamp of every record found in one chunk of a capture file."""
+
+    def __init__(self, buffer, offsets: np.ndarray, caplens: np.ndarray, times: np.ndarray, linktypes: np.ndarray):
+        self.buffer = np.frombuffer(buffer, dtype=np.uint8)
+        self.offsets = offsets
+        self.caplens = caplens
+        self.times = times
+        self.linktypes = linktypes
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def slice(self, start: int, stop: int) -> "RecordBatch":
+        return RecordBatch(self.buffer, self.offsets[start:stop], self.caplens[start:stop], self.times[start:stop],
+                           self.linktypes[start:stop])
+
+
+class PcapReader:
+    """Reads pcap and pcapng files without scapy.
+
+    The file is streamed in fixed-size chunks. Only the record headers and the Ethernet/IPv4/IPv6/TCP/UDP header
+    bytes are looked at, and every chunk is decoded column-wise into a Packets table. Records that are not IP
+    packets are skipped.
+    """
+
+    def __init__(self, file: Union[str, Path], chunk_size: int = CHUNK_SIZE):
+        self.file = Path(file)
+        self.chunk_size = chunk_size
+
+    def read(self) -> Packets:
+        decoder = HeaderDecoder()
+        for batch in self.iter_batches():
+            decoder.decode(batch)
+        return decoder.build()
+
+    def iter_packets(self) -> Iterator[Packets]:
+        """yields the packets chunk by chunk, every chunk is a Packets table of its own
+
+        """
+        for batch in self.iter_batches():
+            decoder = HeaderDecoder()
+            decoder.decode(batch)
+            yield decoder.build()
+
+    def iter_batches(self) -> Iterator[RecordBatch]:
+        with self.file.open("rb") as f:
+            magic = f.read(4)
+            f.seek(0)
+            if magic in PCAP_MAGIC:
+                yield from self.iter_pcap_batches(f)
+            elif magic == PCAPNG_MAGIC:
+                yield from self.iter_pcapng_batches(f)
+            else:
+                raise UnsupportedCapture(f"{self.file} is neither a pcap nor a pcapng file")
+
+    def iter_chunks(self, f, start: int = 0) -> Iterator[Tuple[bytes, bool]]:
+        """yields the file content from start on in chunks, prefixed with the unparsed tail of the previous chunk
+
+        The generator has to be sent the position up to which the previous chunk was consumed.
+        """
+        f.seek(start)
+        tail = b""
+        while True:
+            data = f.read(self.chunk_size)
+            buffer = tail + data
+            consumed = yield buffer, not data
+            if not data:
+                return
+            tail = buffer[consumed:]
+
+    @staticmethod
+    def parse_pcap_header(header: bytes) -> Tuple[str, int, int]:
+        """returns byte order, nanoseconds per timestamp fraction and link type of a pcap file header
+
+        """
+        endian, ns_per_fraction = PCAP_MAGIC[header[:4]]
+        linktype = struct.unpack_from(endian + "I", header, 20)[0] & 0x0fffffff
+        if linktype not in SUPPORTED_LINKTYPES:
+            raise UnsupportedCapture(f"link type {linktype} is not supported")
+        return endian, ns_per_fraction, linktype
+
+    def iter_pcap_batches(self, f) -> Iterator[RecordBatch]:
+        header = f.read(24)
+        if len(header) < 24:
+            return
+        endian, ns_per_fraction, linktype = self.parse_pcap_header(header)
+
+        record = struct.Struct(endian + "IIII")
+        chunks = self.iter_chunks(f, 24)
+        buffer, last = next(chunks)
+        while True:
+            pos = 0
+            offsets, caplens, seconds, fractions = array("q"), array("q"), array("q"), array("q")
+            end = len(buffer)
+            while pos + 16 <= end:
+                sec, frac, caplen, _ = record.unpack_from(buffer, pos)
+                if pos + 16 + caplen > end:
+                    break
+                seconds.append(sec)
+                fractions.append(frac)
+                offsets.append(pos + 16)
+                caplens.append(caplen)
+                pos += 16 + caplen
+
+            if offsets:
+                times = np.array(seconds, dtype=np.int64) * NS_PER_SECOND + \
+                    np.array(fractions, dtype=np.int64) * ns_per_fraction
+                yield RecordBatch(buffer, np.array(offsets, dtype=np.int64), np.array(caplens, dtype=np.int64),
+                                  times, np.full(len(offsets), linktype, dtype=np.int64))
+            if last:
+                return
+            buffer, last = chunks.send(pos)
+
+    def iter_pcapng_batches(self, f) -> Iterator[RecordBatch]:
+        endian = "<"
+        interfaces: List[Tuple[int, int, int]] = []
+
+        chunks = self.iter_chunks(f)
+        buffer, last = next(chunks)
+        while True:
+            pos = 0
+            section_end = False
+            offsets, caplens, interface_ids = array("q"), array("q"), array("q")
+            timestamps_high, timestamps_low = array("q"), array("q")
+            end = len(buffer)
+            while pos + 12 <= end:
+                if buffer[pos:pos + 4] == PCAPNG_MAGIC:
+                    # a new section redefines the interfaces, so the records read so far are emitted first
+                    if offsets:
+                        section_end = True
+                        break
+                    endian = "<" if buffer[pos + 8:pos + 12] == b"\x4d\x3c\x2b\x1a" else ">"
+                block_type, block_length = struct.unpack_from(endian + "II", buffer, pos)
+                if block_length < 12:
+                    raise UnsupportedCapture(f"invalid pcapng block length {block_length}")
+                if pos + block_length > end:
+                    break
+
+                if block_type == 6 or block_type == 2:
+                    if block_type == 6:
+                        interface, high, low, caplen = struct.unpack_from(endian + "IIII", buffer, pos + 8)
+                    else:
+                        interface, _, high, low, caplen = struct.unpack_from(endian + "HHIII", buffer, pos + 8)
+                    offsets.append(pos + 28)
+                    caplens.append(caplen)
+                    interface_ids.append(interface)
+                    timestamps_high.append(high)
+                    timestamps_low.append(low)
+                elif block_type == 1:
+                    interfaces.append(self.parse_interface_description(buffer, pos, block_length, endian))
+                elif block_type == 0x0a0d0d0a:
+                    interfaces = []
+                elif block_type == 3:
+                    raise UnsupportedCapture("simple packet blocks carry no timestamps")
+                pos += block_length
+
+            if offsets:
+                yield self.pcapng_batch(buffer, offsets, caplens, interface_ids, timestamps_high, timestamps_low,
+                                        interfaces)
+            if section_end and last:
+                buffer = buffer[pos:]
+            elif last:
+                return
+            else:
+                buffer, last = chunks.send(pos)
+
+    @staticmethod
+    def parse_interface_description(buffer: bytes, pos: int, block_length: int, endian: str) -> Tuple[int, int, int]:
+        """returns link type and timestamp resolution (base, exponent) of an interface description block
+
+        """
+        linktype = struct.unpack_from(endian + "H", buffer, pos + 8)[0]
+        if linktype not in SUPPORTED_LINKTYPES:
+            raise UnsupportedCapture(f"link type {linktype} is not supported")
+
+        base, exponent = 10, 6
+        option = pos + 16
+        while option + 4 <= pos + block_length - 4:
+            code, length = struct.unpack_from(endian + "HH", buffer, option)
+            if code == 0:
+                break
+            if code == 9 and length >= 1:
+                tsresol = buffer[option + 4]
+                base, exponent = (2, tsresol & 0x7f) if tsresol & 0x80 else (10, tsresol)
+            option += 4 + (length + 3) // 4 * 4
+        return linktype, base, exponent
+
+    @staticmethod
+    def pcapng_batch(buffer, offsets, caplens, interface_ids, timestamps_high, timestamps_low,
+                     interfaces) -> RecordBatch:
+        interface_ids = np.array(interface_ids, dtype=np.int64)
+        if interface_ids.max() >= len(interfaces):
+            raise UnsupportedCapture("packet refers to an undefined interface")
+
+        timestamps = (np.array(timestamps_high, dtype=np.uint64) << np.uint64(32)) | \
+            np.array(timestamps_low, dtype=np.uint64)
+        times = np.empty(len(timestamps), dtype=np.int64)
+        linktypes = np.empty(len(timestamps), dtype=np.int64)
+        for interface, (linktype, base, exponent) in enumerate(interfaces):
+            mask = interface_ids == interface
+            linktypes[mask] = linktype
+            ticks = timestamps[mask]
+            if base == 10 and exponent <= 9:
+                times[mask] = ticks * np.uint64(10 ** (9 - exponent))
+            elif base == 10:
+                times[mask] = ticks // np.uint64(10 ** (exponent - 9))
+            else:
+                whole = ticks >> np.uint64(exponent)
+                fraction = ticks & np.uint64((1 << exponent) - 1)
+                times[mask] = whole * np.uint64(NS_PER_SECOND) + \
+                    (fraction.astype(np.float64) * NS_PER_SECOND / 2 ** exponent).astype(np.uint64)
+
+        return RecordBatch(buffer, np.array(offsets, dtype=np.int64), np.array(caplens, dtype=np.int64), times,
+                           linktypes)
+
+
+class MappedPcapReader(PcapReader):
+    """Reads pcap and pcapng files through a read-only memory map.
+
+    One pass over the record headers builds an index of record offsets. Timestamps and lengths are then read from
+    the mapped headers through strided (or, for varying record sizes, gathered) views, and only the header bytes
+    of each packet are touched. Payloads are never copied, so captures larger than memory can be read and
+    repeated reads of the same file are served from the page cache.
+    """
+
+    def read(self) -> Packets:
+        decoder = HeaderDecoder()
+        with self.file.open("rb") as f:
+            if self.file.stat().st_size < 4:
+                raise UnsupportedCapture(f"{self.file} is neither a pcap nor a pcapng file")
+            # not closed explicitly: the map is released together with the last numpy view into it
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buffer = np.frombuffer(mapped, dtype=np.uint8)
+        for batch in self.index(mapped, buffer):
+            for start in range(0, len(batch), BATCH_RECORDS):
+                decoder.decode(batch.slice(start, start + BATCH_RECORDS))
+        return decoder.build()
+
+    def index(self, mapped: mmap.mmap, buffer: np.ndarray) -> List[RecordBatch]:
+        magic = mapped[:4]
+        if magic in PCAP_MAGIC:
+            return self.index_pcap(mapped, buffer)
+        elif magic == PCAPNG_MAGIC:
+            return self.index_pcapng(mapped, buffer)
+        raise UnsupportedCapture(f"{self.file} is neither a pcap nor a pcapng file")
+
+    def index_pcap(self, mapped: mmap.mmap, buffer: np.ndarray) -> List[RecordBatch]:
+        if len(mapped) < 24:
+            return []
+        endian, ns_per_fraction, linktype = self.parse_pcap_header(mapped[:24])
+
+        read_caplen = struct.Struct(endian + "I").unpack_from
+        offsets = array("q")
+        add_offset = offsets.append
+        pos = 24
+        end = len(mapped) - 16
+        while pos <= end:
+            pos += 16
+            add_offset(pos)
+            pos += read_caplen(mapped, pos - 8)[0]
+        if pos > len(mapped):
+            # the last record is truncated
+            offsets.pop()
+        if not offsets:
+            return []
+
+        offsets = np.array(offsets, dtype=np.int64)
+        u32 = endian + "u4"
+        times = self.read_field(buffer, offsets - 16, u32).astype(np.int64) * NS_PER_SECOND + \
+            self.read_field(buffer, offsets - 12, u32).astype(np.int64) * ns_per_fraction
+        caplens = self.read_field(buffer, offsets - 8, u32).astype(np.int64)
+        return [RecordBatch(buffer, offsets, caplens, times, np.full(len(offsets), linktype, dtype=np.int64))]
+
+    def index_pcapng(self, mapped: mmap.mmap, buffer: np.ndarray) -> List[RecordBatch]:
+        batches = []
+        endian = "<"
+        interfaces: List[Tuple[int, int, int]] = []
+        offsets, block_types = array("q"), array("q")
+
+        pos = 0
+        end = len(mapped)
+        while pos + 12 <= end:
+            if mapped[pos:pos + 4] == PCAPNG_MAGIC:
+                if offsets:
+                    batches.append(self.index_pcapng_section(buffer, offsets, block_types, endian, interfaces))
+                    offsets, block_types = array("q"), array("q")
+                endian = "<" if mapped[pos + 8:pos + 12] == b"\x4d\x3c\x2b\x1a" else ">"
+                interfaces = []
+            block_type, block_length = struct.unpack_from(endian + "II", mapped, pos)
+            if block_length < 12:
+                raise UnsupportedCapture(f"invalid pcapng block length {block_length}")
+            if pos + block_length > end:
+                break
+
+            if block_type == 6 or block_type == 2:
+                offsets.append(pos + 28)
+                block_types.append(block_type)
+            elif block_type == 1:
+                interfaces.append(self.parse_interface_description(mapped, pos, block_length, endian))
+            elif block_type == 3:
+                raise UnsupportedCapture("simple packet blocks carry no timestamps")
+            pos += block_length
+
+        if offsets:
+            batches.append(self.index_pcapng_section(buffer, offsets, block_types, endian, interfaces))
+        return batches
+
+    def index_pcapng_section(self, buffer: np.ndarray, offsets: array, block_types: array, endian: str,
+                             interfaces: List[Tuple[int, int, int]]) -> RecordBatch:
+        offsets = np.array(offsets, dtype=np.int64)
+        u32 = endian + "u4"
+        # enhanced packet blocks store a 32 bit interface id, obsolete packet blocks a 16 bit one
+        interface_ids = self.read_field(buffer, offsets - 20, u32).astype(np.int64)
+        obsolete = np.array(block_types, dtype=np.int64) == 2
+        if obsolete.any():
+            interface_ids[obsolete] = self.read_field(buffer, offsets[obsolete] - 20, endian + "u2")
+        return self.pcapng_batch(buffer, offsets, self.read_field(buffer, offsets - 8, u32).astype(np.int64),
+                                 interface_ids, self.read_field(buffer, offsets - 16, u32),
+                                 self.read_field(buffer, offsets - 12, u32), interfaces)
+
+    @staticmethod
+    def read_field(buffer: np.ndarray, index: np.ndarray, dtype: str) -> np.ndarray:
+        """reads one fixed-size field per record
+
+        Evenly spaced records are read through a strided view of the buffer, otherwise the field bytes are gathered.
+        """
+        dtype = np.dtype(dtype)
+        if len(index) > 1:
+            stride = int(index[1] - index[0])
+            if stride > 0 and (np.diff(index) == stride).all():
+                return np.ndarray(len(index), dtype, buffer=buffer, offset=int(index[0]), strides=(stride,))
+        return np.ascontiguousarray(buffer[index[:, None] + np.arange(dtype.itemsize)]).view(dtype).reshape(-1)
+
+
+class HeaderDecoder:
+    """Decodes the network and transport headers of record batches into a Packets table."""
+
+    def __init__(self):
+        self.builder = PacketsBuilder()
+        self.ipv4_ids: Dict[int, int] = {}
+        self.ipv6_ids: Dict[bytes, int] = {}
+
+    def build(self) -> Packets:
+        return self.builder.build()
+
+    def decode(self, batch: RecordBatch):
+        n = len(batch)
+        l3 = np.zeros(n, dtype=np.int64)
+        ethertype = np.zeros(n, dtype=np.int64)
+        for linktype in np.unique(batch.linktypes).tolist():
+            mask = batch.linktypes == linktype
+            l3[mask], ethertype[mask] = self.decode_link_layer(batch, mask, linktype)
+
+        buffer = batch.buffer
+        end = batch.offsets + batch.caplens
+        version = np.where(ethertype == ETHERTYPE_IPV4, 4, np.where(ethertype == ETHERTYPE_IPV6, 6, 0))
+        version[(version == 4) & (l3 + 20 > end)] = 0
+        version[(version == 6) & (l3 + 40 > end)] = 0
+
+        keep = version != 0
+        if not keep.any():
+            return
+        l3, end, version = l3[keep], end[keep], version[keep]
+        ipv4 = version == 4
+        ipv6 = ~ipv4
+
+        addresses = np.zeros((len(l3), 2, 16), dtype=np.uint8)
+        proto = np.zeros(len(l3), dtype=np.int64)
+        l4 = np.zeros(len(l3), dtype=np.int64)
+        has_l4 = np.ones(len(l3), dtype=bool)
+
+        if ipv4.any():
+            start = l3[ipv4]
+            addresses[ipv4, :, 12:] = self.gather(buffer, start + 12, 8).reshape(-1, 2, 4)
+            proto[ipv4] = buffer[start + 9]
+            l4[ipv4] = start + (buffer[start] & 0x0f).astype(np.int64) * 4
+            has_l4[ipv4] = (self.read_u16(buffer, start + 6) & 0x1fff) == 0
+
+        if ipv6.any():
+            start = l3[ipv6]
+            addresses[ipv6] = self.gather(buffer, start + 8, 32).reshape(-1, 2, 16)
+            next_header, l4[ipv6], has_l4[ipv6] = self.skip_ipv6_extensions(buffer, start + 40, buffer[start + 6],
+                                                                           end[ipv6])
+            proto[ipv6] = next_header
+
+        has_ports = has_l4 & ((proto == 6) | (proto == 17)) & (l4 + 4 <= end)
+        src_ports = np.zeros(len(l3), dtype=np.int64)
+        dst_ports = np.zeros(len(l3), dtype=np.int64)
+        src_ports[has_ports] = self.read_u16(buffer, l4[has_ports])
+        dst_ports[has_ports] = self.read_u16(buffer, l4[has_ports] + 2)
+
+        src_ips, dst_ips = self.intern_addresses(addresses, version)
+        types = np.array([self.builder.intern_type("other"), self.builder.intern_type("TCP"),
+                          self.builder.intern_type("UDP")])[np.select([has_l4 & (proto == 6), has_l4 & (proto == 17)],
+                                                                    [1, 2], 0)]
+
+        self.builder.extend(batch.times[keep], batch.caplens[keep], src_ips, src_ports, dst_ips, dst_ports, version,
+                            types)
+
+    @classmethod
+    def decode_link_layer(cls, batch: RecordBatch, mask: np.ndarray, linktype: int) -> Tuple[np.ndarray, np.ndarray]:
+        """returns the offset of the network layer and its ethertype for all records of one link type
+
+        """
+        buffer = batch.buffer
+        offsets = batch.offsets[mask]
+        end = offsets + batch.caplens[mask]
+        ethertype = np.zeros(len(offsets), dtype=np.int64)
+
+        if linktype == LINKTYPE_ETHERNET:
+            l3 = offsets + 14
+            valid = l3 <= end
+            ethertype[valid] = cls.read_u16(buffer, offsets[valid] + 12)
+            for _ in range(2):
+                vlan = np.isin(ethertype, ETHERTYPE_VLAN) & (l3 + 4 <= end)
+                ethertype[vlan] = cls.read_u16(buffer, l3[vlan] + 2)
+                l3[vlan] += 4
+        elif linktype in LINKTYPE_RAW or linktype == LINKTYPE_IPV4 or linktype == LINKTYPE_IPV6:
+            l3 = offsets
+            valid = l3 < end
+            nibble = buffer[l3[valid]] >> 4
+            ethertype[valid] = np.select([nibble == 4, nibble == 6], [ETHERTYPE_IPV4, ETHERTYPE_IPV6], 0)
+        elif linktype == LINKTYPE_NULL or linktype == LINKTYPE_LOOP:
+            l3 = offsets + 4
+            valid = l3 <= end
+            # the address family is stored in the byte order of the capturing host
+            family = buffer[offsets[valid]] | buffer[offsets[valid] + 3]
+            ethertype[valid] = np.select([family == 2, np.isin(family, (10, 24, 28, 30))],
+                                         [ETHERTYPE_IPV4, ETHERTYPE_IPV6], 0)
+        elif linktype == LINKTYPE_LINUX_SLL:
+            l3 = offsets + 16
+            valid = l3 <= end
+            ethertype[valid] = cls.read_u16(buffer, offsets[valid] + 14)
+        elif linktype == LINKTYPE_LINUX_SLL2:
+            l3 = offsets + 20
+            valid = l3 <= end
+            ethertype[valid] = cls.read_u16(buffer, offsets[valid])
+        else:
+            raise UnsupportedCapture(f"link type {linktype} is not supported")
+        return l3, ethertype
+
+    @classmethod
+    def skip_ipv6_extensions(cls, buffer: np.ndarray, l4: np.ndarray, next_header: np.ndarray,
+                             end: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """follows the common ipv6 extension headers, returns protocol, l4 offset and whether l4 is present
+
+        """
+        next_header = next_header.astype(np.int64)
+        has_l4 = np.ones(len(l4), dtype=bool)
+        for _ in range(4):
+            extension = np.isin(next_header, IPV6_EXTENSION_HEADERS) & (l4 + 8 <= end)
+            fragment = (next_header == IPV6_FRAGMENT_HEADER) & (l4 + 8 <= end)
+            if not (extension.any() or fragment.any()):
+                break
+            has_l4[fragment] &= (cls.read_u16(buffer, l4[fragment] + 2) & 0xfff8) == 0
+            step = np.where(fragment, 8, (buffer[np.minimum(l4 + 1, len(buffer) - 1)].astype(np.int64) + 1) * 8)
+            moved = extension | fragment
+            next_header[moved] = buffer[l4[moved]]
+            l4[moved] += step[moved]
+        return next_header, l4, has_l4
+
+    def intern_addresses(self, addresses: np.ndarray, version: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """maps the raw source and destination addresses to ids of the packet table
+
+        """
+        ids = np.empty((len(version), 2), dtype=np.int64)
+        ipv4 = version == 4
+        if ipv4.any():
+            # ipv4 addresses are grouped as integers, which is a lot cheaper than grouping raw bytes
+            keys = addresses[ipv4, :, 12:].copy().view(">u4")[..., 0]
+            ids[ipv4] = self.lookup_addresses(keys, self.ipv4_ids,
+                                              lambda key: socket.inet_ntop(socket.AF_INET, key.to_bytes(4, "big")))
+        if not ipv4.all():
+            keys = np.ascontiguousarray(addresses[~ipv4]).view("V16")[..., 0]
+            ids[~ipv4] = self.lookup_addresses(keys, self.ipv6_ids,
+                                               lambda key: socket.inet_ntop(socket.AF_INET6, key))
+        return ids[:, 0], ids[:, 1]
+
+    def lookup_addresses(self, keys: np.ndarray, address_ids: dict, to_string) -> np.ndarray:
+        unique, inverse = np.unique(keys, return_inverse=True)
+        ids = np.empty(len(unique), dtype=np.int64)
+        for idx, key in enumerate(unique.tolist()):
+            ip_id = address_ids.get(key)
+            if ip_id is None:
+                ip_id = address_ids[key] = self.builder.intern_ip(to_string(key))
+            ids[idx] = ip_id
+        return ids[inverse.reshape(keys.shape)]
+
+    @staticmethod
+    def gather(buffer: np.ndarray, start: np.ndarray, length: int) -> np.ndarray:
+        return buffer[start[:, None] + np.arange(length)]
+
+    @staticmethod
+    def read_u16(buffer: np.ndarray, index: np.ndarray) -> np.ndarray:
+        return (buffer[index].astype(np.int64) << 8) | buffer[index + 1]
@@ -0,0 +1,51 @@
+import numpy as np
+
+STATISTICS = ["count", "mean", "std", "min", "max", "variance", "variance_coefficient", "mode", "kurtosis",
+              "skewness", "median"]
+
+
+def describe(values, statistics=STATISTICS) -> dict:
+    """returns the requested statistics of values, computed from one sorted copy and one set of central moments
+
+    Matches the previous pandas/numpy/scipy getters: std is the sample standard deviation, variance the population
+    variance, mode the smallest most frequent value and kurtosis/skewness the biased Fisher estimates.
+    """
+    data = np.sort(np.asarray(values, dtype=np.float64).ravel())
+    n = len(data)
+    if not n:
+        return {statistic: 0.0 if statistic == "count" else float("nan") for statistic in statistics}
+
+    described = {"count": float(n),
+                 "min": float(data[0]),
+                 "max": float(data[-1]),
+                 "median": float((data[(n - 1) // 2] + data[n // 2]) / 2)}
+
+    if "mode" in statistics:
+        run_starts = np.flatnonzero(np.concatenate(([True], data[1:] != data[:-1])))
+        run_lengths = np.diff(np.append(run_starts, n))
+        # argmax picks the first, i.e. the smallest, of equally frequent values
+        described["mode"] = float(data[run_starts[np.argmax(run_lengths)]])
+
+    if set(statistics) & {"mean", "std", "variance", "variance_coefficient", "kurtosis", "skewness"}:
+        mean = data.sum() / n
+        deviations = data - mean
+        squared = deviations * deviations
+        described.update(moment_statistics(n, mean, squared.sum() / n, (squared * deviations).sum() / n,
+                                           (squared * squared).sum() / n))
+
+    return {statistic: described[statistic] for statistic in statistics}
+
+
+def moment_statistics(n: int, mean: float, m2: float, m3: float, m4: float) -> dict:
+    """returns the moment based statistics from the count, the mean and the 2nd to 4th central moments
+
+    """
+    # like scipy, a variance lost in rounding counts as no variance
+    constant = m2 <= (np.finfo(np.float64).eps * mean) ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {"mean": float(mean),
+                "std": float(np.sqrt(m2 * n / (n - 1))) if n > 1 else float("nan"),
+                "variance": float(m2),
+                "variance_coefficient": float(np.sqrt(m2) / mean),
+                "skewness": float("nan") if constant else float(m3 / m2 ** 1.5),
+                "kurtosis": -3.0 if constant else float(m4 / m2 ** 2 - 3)}
@@ -0,0 +1,30 @@
+from typing import List
+import importlib
+
+
+class LazyModule:
+    """Stands in for a module that is only imported when one of its attributes is used for the first time.
+
+    Keeps heavy dependencies like scipy, pandas or networkx out of the startup of commands that never need them.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.module = None
+
+    def __getattr__(self, attribute: str):
+        if self.module is None:
+            self.module = importlib.import_module(self.name)
+        return getattr(self.module, attribute)
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def preload(names: List[str]):
+    """imports the modules now, e.g. before forking worker processes that would otherwise each import them
+
+    """
+    for name in names:
+        importlib.import_module(name)
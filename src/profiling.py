@@ -0,0 +1,246 @@
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from pathlib import Path
+from typing import List, Union
+import json
+import os
+import time
+import tracemalloc
+
+import click
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# the recorder of this process while a command runs with --profile, None otherwise
+_recorder = None
+_no_stage = nullcontext()
+
+
+class Recorder:
+    """Records the wall time, CPU time, peak traced allocations and peak RSS of nested pipeline stages.
+
+    Every finished stage becomes a record with its path of stage names, the file it belongs to and the process it ran
+    in. The peak of the traced allocations is the highest amount allocated during the stage on top of what was
+    allocated when it started, the peak RSS is the high water mark of the whole process when the stage ended.
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.records = []
+        self.stack = []
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str, file: Union[None, str] = None):
+        parent = self.stack[-1] if self.stack else None
+        frame = {"path": f"{parent['path']}/{name}" if parent else name,
+                 "file": str(file) if file is not None else (parent["file"] if parent else None)}
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if parent:
+                parent["peak"] = max(parent["peak"], peak)
+            tracemalloc.reset_peak()
+            frame["start"] = frame["peak"] = current
+        self.stack.append(frame)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            record = {"stage": frame["path"], "file": frame["file"], "worker": os.getpid(),
+                      "wall": time.perf_counter() - wall, "cpu": time.process_time() - cpu,
+                      "peak_allocated": None, "peak_rss": get_peak_rss()}
+            if self.trace_memory:
+                frame["peak"] = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+                record["peak_allocated"] = frame["peak"] - frame["start"]
+                if parent:
+                    parent["peak"] = max(parent["peak"], frame["peak"])
+            self.stack.pop()
+            self.records.append(record)
+
+    def stop(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+class ProfiledWorker:
+    """Runs a worker function as a stage of the file it gets as first argument, and returns the records of the call
+    along with its result, so that the parent process can merge the profiles of all workers.
+
+    """
+
+    def __init__(self, function, trace_memory: bool = True):
+        self.function = function
+        self.trace_memory = trace_memory
+
+    def __call__(self, *args, **kwargs):
+        global _recorder
+        if _recorder is None:
+            # a spawned worker does not inherit the recorder of the parent
+            _recorder = Recorder(self.trace_memory)
+        start = len(_recorder.records)
+        try:
+            with _recorder.stage(self.function.__name__, args[0] if args else None):
+                result = self.function(*args, **kwargs)
+            return result, _recorder.records[start:]
+        finally:
+            del _recorder.records[start:]
+
+
+def get_peak_rss() -> Union[None, int]:
+    """returns the peak resident set size of the process in bytes, None where it is not available
+
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macOS bytes
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def is_enabled() -> bool:
+    return _recorder is not None
+
+
+def enable(trace_memory: bool = True):
+    global _recorder
+    _recorder = Recorder(trace_memory)
+
+
+def disable() -> List[dict]:
+    """stops profiling and returns the records
+
+    """
+    global _recorder
+    records = _recorder.records if _recorder is not None else []
+    if _recorder is not None:
+        _recorder.stop()
+    _recorder = None
+    return records
+
+
+def stage(name: str, file: Union[None, str] = None):
+    """returns a context manager recording a stage while profiling, a shared no-op one otherwise
+
+    """
+    if _recorder is None:
+        return _no_stage
+    return _recorder.stage(name, file)
+
+
+def profiled(name: str):
+    """decorates a function so that every call is recorded as a stage while profiling
+
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return function(*args, **kwargs)
+            with _recorder.stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def wrap(function):
+    """returns the worker function to hand to a process pool, profiled only while profiling
+
+    """
+    if _recorder is None:
+        return function
+    return ProfiledWorker(function, _recorder.trace_memory)
+
+
+def unwrap(result):
+    """returns the result of a worker call, and merges its records while profiling
+
+    """
+    if _recorder is None:
+        return result
+    result, records = result
+    _recorder.records.extend(records)
+    return result
+
+
+def summarize(records: List[dict], key: str) -> dict:
+    """returns per value of key and stage the number of calls, the summed wall and cpu time and the peaks
+
+    """
+    summary = {}
+    for record in records:
+        group = summary.setdefault(str(record[key]), {}) if key != "stage" else summary
+        totals = group.setdefault(record["stage"], {"calls": 0, "wall": 0.0, "cpu": 0.0, "peak_allocated": None,
+                                                    "peak_rss": None})
+        totals["calls"] += 1
+        totals["wall"] += record["wall"]
+        totals["cpu"] += record["cpu"]
+        for peak in ["peak_allocated", "peak_rss"]:
+            if record[peak] is not None:
+                totals[peak] = max(totals[peak] or 0, record[peak])
+    return summary
+
+
+def get_report(records: List[dict]) -> dict:
+    """returns the stages summed over all records, per file and per process, and the records themselves
+
+    """
+    parent = os.getpid()
+    records = [{**record, "worker": "main" if record["worker"] == parent else str(record["worker"])}
+               for record in records]
+    return {"stages": summarize(records, "stage"),
+            "files": summarize([record for record in records if record["file"] is not None], "file"),
+            "workers": summarize(records, "worker"),
+            "records": records}
+
+
+def format_report(report: dict) -> str:
+    """returns the stages as a table, times are inclusive of the nested stages and summed over all processes
+
+    """
+    lines = [f"{'stage':<78} {'calls':>6} {'wall s':>9} {'cpu s':>9} {'alloc MiB':>10} {'rss MiB':>8}"]
+    for name, totals in sorted(report["stages"].items()):
+        lines.append(f"{name[-78:]:<78} {totals['calls']:>6} {totals['wall']:9.3f} {totals['cpu']:9.3f} "
+                     f"{to_mebibytes(totals['peak_allocated']):>10} {to_mebibytes(totals['peak_rss']):>8}")
+    lines.append("")
+    lines.append(f"{'process':<78} {'files':>6} {'wall s':>9} {'cpu s':>9}")
+    for worker, stages in report["workers"].items():
+        # the outermost stages of a process hold the time of all others
+        outer = [totals for name, totals in stages.items() if not any(name.startswith(other + "/")
+                                                                      for other in stages)]
+        files = {record["file"] for record in report["records"] if record["worker"] == worker
+                 and record["file"] is not None}
+        lines.append(f"{worker:<78} {len(files):>6} {sum(totals['wall'] for totals in outer):9.3f} "
+                     f"{sum(totals['cpu'] for totals in outer):9.3f}")
+    return "\n".join(lines)
+
+
+def to_mebibytes(value: Union[None, int]) -> str:
+    return "-" if value is None else f"{value / (1 << 20):.1f}"
+
+
+def profile_command(name: str):
+    """decorates a command with a profile argument: if it is set, the command runs as a profiled stage and its
+    profile is written to that json file and printed as a table
+
+    """
+    def decorator(command):
+        @wraps(command)
+        def wrapper(*args, profile=None, **kwargs):
+            if profile is None:
+                return command(*args, **kwargs)
+            enable()
+            try:
+                with stage(name):
+                    return command(*args, **kwargs)
+            finally:
+                report = get_report(disable())
+                with Path(profile).open("w") as profile_json:
+                    json.dump(report, profile_json)
+                click.echo(format_report(report))
+                click.echo(f"Wrote profile to {profile}")
+        return wrapper
+    return decorator
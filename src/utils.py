@@ -1,20 +1,55 @@
 from src.PacketCapture import PacketCapture
+from src.datamodel.Columnar import ColumnarReader, COLUMNAR_SUFFIX
 from src.datamodel.MinLog import MinLogReader
+from src.datamodel.Packet import Packets
 from src.datamodel.Pcap import Pcap
+from src.profiling import profiled
 
 from pathlib import Path
-from typing import Union
+from typing import Iterator, Union
+
+
+def is_supported(file: str) -> bool:
+    return Path(file).suffix.lower() in [".pcap", ".pcapng", ".log", COLUMNAR_SUFFIX]
 
 
 def read_file(file: str) -> Union[None, PacketCapture]:
+    packets = read_packets(file)
+    if packets is None:
+        return
+    return PacketCapture(Path(file), packets)
+
+
+@profiled("read")
+def read_packets(file: str) -> Union[None, Packets]:
+    """returns the packet table of the file without building a PacketCapture, or None for unsupported file types
+
+    """
+    file = Path(file)
+    file_type = file.suffix.lower()
+
+    if file_type in [".pcap", ".pcapng"]:
+        return Pcap(file).read()
+    elif file_type == ".log":
+        return MinLogReader(file).read()
+    elif file_type == COLUMNAR_SUFFIX:
+        return ColumnarReader(file).read()
+    else:
+        return
+
+
+def iter_packets(file: str) -> Union[None, Iterator[Packets]]:
+    """returns an iterator over the packets of the file in chunks, or None for unsupported file types
+
+    """
     file = Path(file)
     file_type = file.suffix.lower()
 
-    if file_type == ".pcap":
-        packets = Pcap(file).read()
-        return PacketCapture(file, packets)
+    if file_type in [".pcap", ".pcapng"]:
+        return Pcap(file).iter_packets()
     elif file_type == ".log":
-        packets = MinLogReader(file).read()
-        return PacketCapture(file, packets)
+        return MinLogReader(file).iter_packets()
+    elif file_type == COLUMNAR_SUFFIX:
+        return ColumnarReader(file).iter_packets()
     else:
         return
@@ -1,6 +1,9 @@
-from jinja2 import Template
+from src.lazy import lazy_import
+
 import json
 
+jinja2 = lazy_import("jinja2")
+
 try:
     import importlib.resources as pkg_resources
 except ImportError:
@@ -9,7 +12,7 @@ except ImportError:
 
 def visualize(dicts: dict, out: str):
     with pkg_resources.path('resources', "viz.j2") as file_:
-        template = Template(file_.read_text())
+        template = jinja2.Template(file_.read_text())
 
     with pkg_resources.path("resources", "vis.min.css") as viscss:
         vis_css = viscss.read_text()